@@ -0,0 +1,9 @@
+import multiprocessing
+import sys
+
+from webapp.api import main
+
+if __name__ == "__main__":
+    # required for the parse worker pool to start in frozen builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 from pathlib import Path
 
@@ -15,6 +16,8 @@ def resolve_path(path: str) -> str:
 
 
 if __name__ == "__main__":
+    # required for the parse worker pool to start in frozen builds
+    multiprocessing.freeze_support()
     config = StreamlitConfig()
     sys.argv = [
         "streamlit",
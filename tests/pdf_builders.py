@@ -0,0 +1,43 @@
+"""Synthetic PDFs for tests that need control over the content streams of a statement."""
+
+import pymupdf
+
+
+def show_text(text: str, y: int = 700) -> bytes:
+    return b"BT /F1 10 Tf 1 0 0 1 10 %d Tm (%s) Tj ET" % (y, text.encode())
+
+
+def build_pdf(*pages: bytes) -> bytes:
+    """A PDF with the given content streams, compressed as most statements' are."""
+    pdf = pymupdf.open()
+    for content in pages:
+        page = pdf.new_page()
+        page.insert_text((10, 10), "placeholder")
+        [xref] = page.get_contents()
+        pdf.update_stream(xref, content, compress=True)
+    return pdf.tobytes(deflate=True)
+
+
+def build_raw_pdf(objects: dict[int, bytes]) -> bytes:
+    """Write objects in the given order, without an xref table, which the scanner doesn't need."""
+    body = b"".join(b"%d 0 obj\n%s\nendobj\n" % (num, obj) for num, obj in objects.items())
+    return b"%PDF-1.7\n" + body + b"trailer\n<< /Root 1 0 R >>\n%%EOF\n"
+
+
+def stream_object(data: bytes, dictionary: bytes | None = None) -> bytes:
+    if dictionary is None:
+        dictionary = b"/Length %d" % len(data)
+    return b"<< " + dictionary + b" >>\nstream\n" + data + b"\nendstream"
+
+
+def page_tree(*contents: bytes) -> dict[int, bytes]:
+    """A catalog and a flat page tree, with one page per content stream object."""
+    page_nums = [10 + i for i in range(len(contents))]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % n for n in page_nums), len(contents)),
+    }
+    for i, (page_num, content) in enumerate(zip(page_nums, contents, strict=True)):
+        objects[page_num] = b"<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>" % (20 + i)
+        objects[20 + i] = content
+    return objects
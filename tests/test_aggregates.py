@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+import pandas as pd
+import streamlit as st
+
+from webapp.aggregates import build_cash_flow_cube, get_cash_flow_cube
+from webapp.helpers import create_df
+from webapp.models import ProcessedFile, TransactionMetadata
+
+
+def create_transactions() -> pd.DataFrame:
+    example_transactions = [
+        {"date": "2024-01-05", "description": "SALARY", "amount": 1000.0},
+        {"date": "2024-01-20", "description": "GROCERIES", "amount": -120.5},
+        {"date": "2024-03-02", "description": "REFUND", "amount": 30.0},
+        {"date": "2024-03-15", "description": "RENT", "amount": -800.0},
+    ]
+    other_transactions = [
+        {"date": "2024-01-07", "description": "TRANSFER", "amount": 50.0},
+        {"date": "2025-02-01", "description": "FEE", "amount": -5.0},
+    ]
+    return create_df(
+        [
+            ProcessedFile(example_transactions, TransactionMetadata("ExampleBank")),
+            ProcessedFile(other_transactions, TransactionMetadata("OtherBank")),
+        ]
+    )
+
+
+def test_monthly_cash_flow():
+    cube = build_cash_flow_cube(create_transactions())
+
+    cash_flow = cube.get("Month", ["ExampleBank"])
+
+    assert cash_flow.index.equals(pd.DatetimeIndex(["2024-01-01", "2024-02-01", "2024-03-01"], name="period"))
+    assert cash_flow["Income"].tolist() == [1000.0, 0.0, 30.0]
+    assert cash_flow["Expenses"].tolist() == [120.5, 0.0, 800.0]
+    assert cash_flow["Savings"].tolist() == [879.5, 0.0, -770.0]
+
+
+def test_cash_flow_granularities():
+    df = create_transactions()
+    cube = build_cash_flow_cube(df)
+    assert cube.banks == ["ExampleBank", "OtherBank"]
+
+    for granularity, rows in [("Day", 394), ("Week", 57), ("Month", 14), ("Year", 2)]:
+        cash_flow = cube.get(granularity)
+        assert len(cash_flow) == rows
+        assert cash_flow["Savings"].sum() == df["amount"].sum()
+        assert cash_flow["Income"].sum() == df["amount"].clip(lower=0).sum()
+
+    assert cube.get("Week", ["OtherBank"]).index[0] == pd.Timestamp("2024-01-01")
+    assert cube.get("Year", ["OtherBank"])["Expenses"].tolist() == [0.0, 5.0]
+    assert cube.get("Month", []).empty
+
+
+def test_cash_flow_cube_is_reused():
+    st.session_state.pop("cash_flow_cube", None)
+    df = create_transactions()
+
+    with patch("webapp.aggregates.build_cash_flow_cube", wraps=build_cash_flow_cube) as build:
+        cube = get_cash_flow_cube(df)
+        assert get_cash_flow_cube(df.copy()) is cube
+        assert build.call_count == 1
+
+        df.loc[0, "amount"] = 500.0
+        assert get_cash_flow_cube(df).get("Day")["Income"].iloc[0] == 500.0
+        assert build.call_count == 2
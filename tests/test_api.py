@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import patch
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from webapp.api import make_app
+from webapp.config import AppConfig
+from webapp.processing import create_executor, parse_file
+
+
+def encode_multipart(files: list[str], passwords: list[str] = ()) -> tuple[dict, bytes]:
+    boundary = uuid4().hex
+    parts = []
+    for file_name in files:
+        with open(f"tests/fixtures/{file_name}", "rb") as f:
+            data = f.read()
+        header = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+            "Content-Type: application/pdf\r\n\r\n"
+        )
+        parts.append(header.encode() + data + b"\r\n")
+    for password in passwords:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="password"\r\n\r\n{password}\r\n'.encode())
+    parts.append(f"--{boundary}--\r\n".encode())
+    return {"Content-Type": f"multipart/form-data; boundary={boundary}"}, b"".join(parts)
+
+
+class TestConvert(AsyncHTTPTestCase):
+    def get_app(self):
+        self.executor = create_executor(1)
+        return make_app(self.executor, AppConfig())
+
+    def tearDown(self):
+        super().tearDown()
+        self.executor.shutdown()
+
+    def convert(self, files, passwords=(), output_format="json"):
+        headers, body = encode_multipart(files, passwords)
+        return self.fetch(f"/convert?format={output_format}", method="POST", headers=headers, body=body)
+
+    def test_convert_json(self):
+        response = self.convert(["example_statement.pdf", "protected_example_statement.pdf"], ["foobar123"])
+        assert response.code == 200
+
+        body = json.loads(response.body)
+        assert body["errors"] == {}
+        assert [file["file"] for file in body["files"]] == [
+            "example_statement.pdf",
+            "protected_example_statement.pdf",
+        ]
+        expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+        for file in body["files"]:
+            assert file["bank"] == "ExampleBank"
+            assert [t["description"] for t in file["transactions"]] == expected_df["description"].tolist()
+
+    def test_convert_csv(self):
+        response = self.convert(["example_statement.pdf"], output_format="csv")
+        assert response.code == 200
+        assert response.headers["Content-Type"].startswith("text/csv")
+
+        df = pd.read_csv(StringIO(response.body.decode()))
+        df.columns = [col.lower() for col in df.columns]
+        expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+        assert df[expected_df.columns].equals(expected_df)
+
+    def test_convert_parquet(self):
+        response = self.convert(["example_statement.pdf"], output_format="parquet")
+        assert response.code == 200
+        assert response.headers["Content-Type"] == "application/vnd.apache.parquet"
+
+        table = pq.read_table(pa.BufferReader(response.body))
+        expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+        assert table.column("Description").to_pylist() == expected_df["description"].tolist()
+
+    def test_missing_password(self):
+        with patch.dict(os.environ, {"PDF_PASSWORDS": "[]"}):
+            response = self.convert(["protected_example_statement.pdf"])
+        assert response.code == 422
+        assert "protected_example_statement.pdf" in json.loads(response.body)["errors"]
+
+    def test_no_files(self):
+        response = self.fetch("/convert", method="POST", body=b"")
+        assert response.code == 400
+
+
+def slow_parse_file(*args, **kwargs):
+    time.sleep(0.5)
+    return parse_file(*args, **kwargs)
+
+
+class TestLimits(AsyncHTTPTestCase):
+    def get_app(self):
+        # a thread pool lets the slow parser be patched in
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        config = AppConfig(api_max_concurrent_requests=1, api_request_timeout=0.2)
+        return make_app(self.executor, config)
+
+    def tearDown(self):
+        super().tearDown()
+        self.executor.shutdown()
+
+    def post(self):
+        headers, body = encode_multipart(["example_statement.pdf"])
+        return self.http_client.fetch(
+            self.get_url("/convert"), method="POST", headers=headers, body=body, raise_error=False
+        )
+
+    @gen_test
+    async def test_timeout(self):
+        with patch("webapp.api.parse_file", slow_parse_file):
+            response = await self.post()
+        assert response.code == 504
+
+    @gen_test
+    async def test_rejects_requests_when_busy(self):
+        with patch("webapp.api.parse_file", slow_parse_file):
+            responses = await asyncio.gather(self.post(), self.post())
+
+        assert sorted(response.code for response in responses) == [503, 504]
+        busy = next(response for response in responses if response.code == 503)
+        assert busy.headers["Retry-After"] == "1"
+
+    @gen_test
+    async def test_slot_is_held_until_parsing_finishes(self):
+        with patch("webapp.api.parse_file", slow_parse_file):
+            # the request times out, but its file is still being parsed
+            assert (await self.post()).code == 504
+            assert (await self.post()).code == 503
+
+            await asyncio.sleep(0.5)
+            assert (await self.post()).code == 504
+
+    @gen_test
+    async def test_failed_submit_releases_slot(self):
+        with patch.object(self.executor, "submit", side_effect=RuntimeError("pool is broken")):
+            responses = [await self.post() for _ in range(3)]
+        assert [response.code for response in responses] == [500, 500, 500]
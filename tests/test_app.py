@@ -1,14 +1,20 @@
 # pylint: disable=no-name-in-module
 import os
-from unittest.mock import patch
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import Mock, patch
 from uuid import uuid4
 
 import pandas as pd
 import pytest
+import streamlit as st
+from monopoly.pdf import MissingOCRError
 from streamlit.proto.Common_pb2 import FileURLs
 from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
 
-from webapp.app import app
+from webapp.app import app, get_ocr_queue
+from webapp.processing import parse_file
 
 
 def create_uploaded_file(file_name):
@@ -44,6 +50,8 @@ def test_app(uploaded_file):
     df["date"] = pd.to_datetime(df["date"])
     df = df[["description", "amount", "date", "bank"]]
     expected_df["date"] = pd.to_datetime(expected_df["date"])
+    expected_df["description"] = expected_df["description"].astype("string[pyarrow]")
+    expected_df["bank"] = expected_df["bank"].astype("category")
     assert df.equals(expected_df)
 
 
@@ -58,5 +66,160 @@ def test_unlock_protected(protected_file):
     df["date"] = pd.to_datetime(df["date"])
     df = df[["description", "amount", "date", "bank"]]
     expected_df["date"] = pd.to_datetime(expected_df["date"])
+    expected_df["description"] = expected_df["description"].astype("string[pyarrow]")
+    expected_df["bank"] = expected_df["bank"].astype("category")
 
     assert df.equals(expected_df)
+
+
+def test_app_parse_workers(monkeypatch):
+    monkeypatch.setenv("PARSE_WORKERS", "2")
+    monkeypatch.setenv("PDF_PASSWORDS", '["foobar123"]')
+    files = [create_uploaded_file("protected_example_statement.pdf"), create_uploaded_file("example_statement.pdf")]
+    with patch("webapp.app.get_files") as get_files:
+        get_files.return_value = files
+        df = app()
+
+    expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+    expected_df = pd.concat([expected_df, expected_df], ignore_index=True)
+
+    df["date"] = pd.to_datetime(df["date"])
+    df = df[["description", "amount", "date", "bank"]]
+    expected_df["date"] = pd.to_datetime(expected_df["date"])
+    expected_df["description"] = expected_df["description"].astype("string[pyarrow]")
+    expected_df["bank"] = expected_df["bank"].astype("category")
+
+    assert df.equals(expected_df)
+
+
+def test_parse_cache(uploaded_file, monkeypatch, tmp_path):
+    monkeypatch.setenv("PARSE_CACHE_DIR", str(tmp_path))
+    st.session_state.clear()
+    with patch("webapp.app.get_files") as get_files:
+        get_files.return_value = [uploaded_file]
+        app()
+
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+    # a new session should read the parsed statement back from disk
+    st.session_state.clear()
+    with patch("webapp.app.get_files") as get_files, patch("webapp.app.parse_bank_statement") as parse:
+        get_files.return_value = [create_uploaded_file("example_statement.pdf")]
+        df = app()
+
+    parse.assert_not_called()
+    assert len(df) == len(pd.read_csv("tests/fixtures/example_statement.csv"))
+
+
+def test_ocr_runs_in_background(uploaded_file):
+    st.session_state.clear()
+    ocr_executor = ThreadPoolExecutor(max_workers=1)
+    ocr_finished = threading.Event()
+
+    def ocr_parse_file(*args, **kwargs):
+        ocr_finished.wait()
+        return parse_file(*args, **kwargs)
+
+    with (
+        patch("webapp.app.get_files", return_value=[uploaded_file]),
+        patch("webapp.app.parse_bank_statement", side_effect=MissingOCRError),
+        patch("webapp.app.get_ocr_executor", return_value=ocr_executor),
+        patch("webapp.app.parse_file", ocr_parse_file),
+    ):
+        # the statement is left out while its OCR job runs
+        assert app() is None
+        [(future, file_name)] = st.session_state["ocr_jobs"].values()
+        assert file_name == "example_statement.pdf"
+
+        ocr_finished.set()
+        future.result()
+        df = app()
+
+    assert not st.session_state["ocr_jobs"]
+    assert len(df) == len(pd.read_csv("tests/fixtures/example_statement.csv"))
+
+
+def test_broken_parse_pool_on_submit(uploaded_file):
+    st.session_state.clear()
+    executor = Mock(**{"submit.side_effect": BrokenProcessPool})
+
+    with (
+        patch("webapp.app.get_files", return_value=[uploaded_file]),
+        patch("webapp.app.get_executor", return_value=executor),
+        patch("webapp.app.discard_executor") as discard_executor,
+    ):
+        df = app()
+
+    discard_executor.assert_called_once()
+    # the statement is parsed on the script thread instead
+    assert len(df) == len(pd.read_csv("tests/fixtures/example_statement.csv"))
+
+
+def test_broken_parse_pool_on_result(uploaded_file):
+    st.session_state.clear()
+    future = Future()
+    future.set_exception(BrokenProcessPool())
+    executor = Mock(**{"submit.return_value": future})
+
+    with (
+        patch("webapp.app.get_files", return_value=[uploaded_file]),
+        patch("webapp.app.get_executor", return_value=executor),
+        patch("webapp.app.discard_executor") as discard_executor,
+    ):
+        assert app() is None
+
+    discard_executor.assert_called_once()
+    assert discard_executor.call_args.args[2] is executor
+
+
+def test_ocr_queue_is_bounded(monkeypatch):
+    st.session_state.clear()
+    monkeypatch.setenv("OCR_QUEUE_SIZE", "1")
+    monkeypatch.setenv("PDF_PASSWORDS", '["foobar123"]')
+    get_ocr_queue.cache_clear()
+    files = [create_uploaded_file("example_statement.pdf"), create_uploaded_file("protected_example_statement.pdf")]
+    ocr_executor = ThreadPoolExecutor(max_workers=1)
+    ocr_finished = threading.Event()
+
+    with (
+        patch("webapp.app.get_files", return_value=files),
+        patch("webapp.app.parse_bank_statement", side_effect=MissingOCRError),
+        patch("webapp.app.get_ocr_executor", return_value=ocr_executor),
+        patch("webapp.app.parse_file", side_effect=lambda *args, **kwargs: ocr_finished.wait()),
+        patch.object(st, "warning") as warning,
+    ):
+        app()
+
+    # only one statement fits in the queue, and the other is turned away
+    [(future, file_name)] = st.session_state["ocr_jobs"].values()
+    assert file_name == "example_statement.pdf"
+    warning.assert_called_once()
+    assert "protected_example_statement.pdf" in warning.call_args.args[0]
+
+    ocr_finished.set()
+    future.result()
+    ocr_executor.shutdown()
+    # the slot is freed once the job finishes
+    assert get_ocr_queue(1).acquire(blocking=False)
+    get_ocr_queue.cache_clear()
+
+
+def test_broken_ocr_pool_on_submit(uploaded_file):
+    st.session_state.clear()
+    broken = Mock(**{"submit.side_effect": BrokenProcessPool})
+    ocr_executor = ThreadPoolExecutor(max_workers=1)
+
+    with (
+        patch("webapp.app.get_files", return_value=[uploaded_file]),
+        patch("webapp.app.parse_bank_statement", side_effect=MissingOCRError),
+        patch("webapp.app.get_ocr_executor", side_effect=[broken, ocr_executor]),
+        patch("webapp.app.discard_executor") as discard_executor,
+        patch("webapp.app.parse_file", return_value=None),
+    ):
+        app()
+
+    discard_executor.assert_called_once()
+    # the job is submitted to the new pool instead
+    [(future, _)] = st.session_state["ocr_jobs"].values()
+    future.result()
+    ocr_executor.shutdown()
@@ -0,0 +1,53 @@
+from importlib.metadata import PackageNotFoundError
+from unittest.mock import patch
+
+from webapp import cache
+from webapp.cache import DiskCache, OcrPageCache
+
+
+def test_app_version_from_source_checkout():
+    def version(name):
+        if name == "statement_sensei":
+            raise PackageNotFoundError(name)
+        return "1.0.0"
+
+    with patch("webapp.cache.version", side_effect=version):
+        app_version = cache.get_app_version()
+        assert app_version.startswith("source-")
+        assert cache.get_app_version() == app_version
+
+        cache.get_parser_identity.cache_clear()
+        try:
+            assert f"statement-sensei=={app_version}".encode() in cache.get_parser_identity()
+        finally:
+            cache.get_parser_identity.cache_clear()
+
+
+def test_unwritable_cache_is_skipped(tmp_path):
+    # the cache directory can't be created, as it would be on a read-only or full disk
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_bytes(b"")
+    disk_cache = DiskCache(not_a_directory / "cache", max_bytes=1024)
+
+    disk_cache.write("key", b"data")
+    assert disk_cache.read("key") is None
+    disk_cache.discard("key")
+
+
+def test_read_does_not_recreate_evicted_entries(tmp_path):
+    ocr_cache = OcrPageCache(tmp_path, max_bytes=1024)
+    ocr_cache.write("key", b"data")
+    path = next(tmp_path.glob("*.pdf"))
+
+    # another process evicts the entry between the read and refreshing its modification time
+    read_bytes = path.read_bytes
+
+    def read_then_evict():
+        data = read_bytes()
+        path.unlink()
+        return data
+
+    with patch.object(type(path), "read_bytes", side_effect=read_then_evict):
+        assert ocr_cache.read("key") == b"data"
+    assert not path.exists()
+    assert ocr_cache.read("key") is None
@@ -0,0 +1,74 @@
+import json
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from webapp.cli import main
+
+
+@pytest.fixture()
+def password_file(tmp_path):
+    path = tmp_path / "passwords.txt"
+    path.write_text("wrongpass\n\nfoobar123\n")
+    return path
+
+
+def read_output(path):
+    df = pd.read_csv(path)
+    df.columns = [col.lower() for col in df.columns]
+    return df[["description", "amount", "date", "bank"]]
+
+
+def test_convert(tmp_path, password_file, monkeypatch):
+    monkeypatch.delenv("PDF_PASSWORDS", raising=False)
+    output = tmp_path / "out.csv"
+
+    assert main(["convert", "tests/fixtures", "-o", str(output), "--password-file", str(password_file)]) == 0
+
+    expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+    expected_df = pd.concat([expected_df, expected_df], ignore_index=True)
+    assert read_output(output).equals(expected_df)
+
+
+def test_convert_resumes_from_manifest(tmp_path, monkeypatch):
+    monkeypatch.delenv("PDF_PASSWORDS", raising=False)
+    output = tmp_path / "out.csv"
+    manifest = tmp_path / "manifest.jsonl"
+    args = ["convert", "tests/fixtures/*.pdf", "-o", str(output), "--manifest", str(manifest)]
+
+    # the protected statement can't be unlocked without a password
+    assert main(args) == 1
+    entries = [json.loads(line) for line in manifest.read_text().splitlines()]
+    assert [entry["status"] for entry in entries] == ["ok", "error"]
+
+    # a run interrupted after appending a file's rows, but before recording it
+    with output.open("a") as f:
+        f.write("2024-01-01,PARTIAL,1.0,ExampleBank\n")
+
+    monkeypatch.setenv("PDF_PASSWORDS", '["foobar123"]')
+    assert main(args) == 0
+    entries = [json.loads(line) for line in manifest.read_text().splitlines()]
+    assert [entry["status"] for entry in entries] == ["ok", "error", "ok"]
+
+    expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+    expected_df = pd.concat([expected_df, expected_df], ignore_index=True)
+    assert read_output(output).equals(expected_df)
+
+
+def test_convert_to_parquet(tmp_path, password_file, monkeypatch):
+    monkeypatch.delenv("PDF_PASSWORDS", raising=False)
+    output = tmp_path / "out.parquet"
+
+    assert main(["convert", "tests/fixtures", "-o", str(output), "--password-file", str(password_file)]) == 0
+
+    df = pq.read_table(output).to_pandas()
+    expected_df = pd.read_csv("tests/fixtures/example_statement.csv")
+    assert len(df) == len(expected_df) * 2
+    assert df["Description"].astype(str).tolist() == expected_df["description"].tolist() * 2
+    assert isinstance(df["Bank"].dtype, pd.CategoricalDtype)
+
+
+def test_manifest_requires_csv(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["convert", "tests/fixtures", "-o", str(tmp_path / "out.arrow"), "--manifest", str(tmp_path / "m.jsonl")])
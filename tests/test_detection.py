@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+import pymupdf
+from monopoly.banks import BankDetector, ExampleBank, Maybank, banks
+from monopoly.generic import GenericBank
+from monopoly.identifiers import MetadataIdentifier, TextIdentifier
+from monopoly.pdf import PdfDocument
+
+from webapp.detection import DetectionConfidence, detect_bank, detect_bank_after_ocr, get_bank_index
+
+
+def test_detect_bank_matches_monopoly():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    expected = BankDetector(document).detect_bank(banks)
+
+    detection = detect_bank(document)
+    assert detection.bank is expected is ExampleBank
+    assert detection.metadata == document.metadata_identifier
+
+
+def test_detect_bank_is_memoised():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    detection = detect_bank(document)
+
+    with patch.object(BankDetector, "identifiers_match") as identifiers_match:
+        assert detect_bank(document) is detection
+    identifiers_match.assert_not_called()
+
+
+def test_detect_bank_after_ocr():
+    blank = pymupdf.open()
+    blank.new_page()
+    document = PdfDocument(file_bytes=blank.tobytes())
+    detection = detect_bank(document)
+    assert detection.bank is GenericBank
+    assert detection.confidence == DetectionConfidence.NONE
+
+    ocr_document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    with patch.object(BankDetector, "identifiers_match", autospec=True, return_value=False) as identifiers_match:
+        assert detect_bank_after_ocr(ocr_document, detection) is detection
+
+    # metadata-only identifiers already failed before OCR, so they aren't checked again
+    checked_groups = [call.args[1] for call in identifiers_match.call_args_list]
+    assert ExampleBank.identifiers[0] in checked_groups
+    assert all(any(isinstance(identifier, TextIdentifier) for identifier in group) for group in checked_groups)
+    assert detect_bank(ocr_document) is detection
+
+
+def metadata_only_documents():
+    for bank in banks:
+        for group in bank.identifiers:
+            if not all(isinstance(identifier, MetadataIdentifier) for identifier in group):
+                continue
+            metadata = {}
+            for identifier in group:
+                metadata.update({key: value for key, value in vars(identifier).items() if value})
+            # the PDF format comes from the file header, and can't be set
+            if "format" in metadata:
+                continue
+            pdf = pymupdf.open()
+            pdf.new_page()
+            pdf.set_metadata(metadata)
+            yield bank, PdfDocument(file_bytes=pdf.tobytes())
+
+
+def test_indexed_detection_matches_linear_scan():
+    documents = list(metadata_only_documents())
+    assert len(documents) > 5
+
+    for bank, document in documents:
+        expected = BankDetector(document).detect_bank(banks)
+        assert expected is bank
+        assert detect_bank(document).bank is expected
+
+
+def test_only_candidate_banks_are_verified():
+    bank, document = next(metadata_only_documents())
+    index = get_bank_index()
+    groups = sum(len(bank.identifiers) for bank in banks)
+
+    with patch.object(BankDetector, "identifiers_match", autospec=True, return_value=True) as identifiers_match:
+        assert detect_bank(document).bank is bank
+
+    [call] = identifiers_match.call_args_list
+    assert call.args[1] in bank.identifiers
+    assert len(index.metadata_candidates(document.metadata_identifier)) < groups
+
+
+def test_earlier_text_group_takes_precedence_over_metadata():
+    # the example statement matches ExampleBank's text identifiers, and its metadata
+    # matches a metadata-only Maybank group, which comes later in the bank order
+    pdf = pymupdf.open("tests/fixtures/example_statement.pdf")
+    pdf.set_metadata({"author": "Maybank2U.com", "creator": "Maybank2u.com", "producer": "iText"})
+    document = PdfDocument(file_bytes=pdf.tobytes())
+    assert BankDetector(document).identifiers_match(Maybank.identifiers[1])
+
+    expected = BankDetector(document).detect_bank(banks)
+    assert expected is ExampleBank
+    assert detect_bank(document).bank is expected
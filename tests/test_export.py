@@ -0,0 +1,38 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from monopoly.pdf import PdfDocument
+
+from webapp.export import TRANSACTIONS_SCHEMA, export_arrow, export_csv, export_parquet, iter_csv_chunks
+from webapp.helpers import create_df, format_df, parse_bank_statement
+
+
+@pytest.fixture(scope="module")
+def df():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    return format_df(create_df([parse_bank_statement(document)] * 3))
+
+
+def test_export_csv_in_chunks(df):
+    chunks = list(iter_csv_chunks(df, chunk_rows=7))
+    assert len(chunks) == 1 + -(-len(df) // 7)
+    assert b"".join(chunks) == df.to_csv(index=False).encode()
+    assert export_csv(df) == df.to_csv(index=False).encode()
+
+
+def test_columnar_exports(df):
+    tables = [
+        pq.read_table(pa.BufferReader(export_parquet(df))),
+        pa.ipc.open_file(pa.BufferReader(export_arrow(df))).read_all(),
+    ]
+
+    for table in tables:
+        assert table.schema.equals(TRANSACTIONS_SCHEMA)
+        assert table.column("Date").to_pylist() == df["Date"].dt.date.tolist()
+        assert table.column("Amount").to_pylist() == df["Amount"].tolist()
+        assert table.column("Bank").to_pylist() == df["Bank"].tolist()
+
+        loaded = table.to_pandas()
+        assert loaded["Description"].astype(str).tolist() == df["Description"].tolist()
+        assert isinstance(loaded["Bank"].dtype, pd.CategoricalDtype)
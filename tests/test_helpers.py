@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pymupdf
+import pytest
+import streamlit as st
+from monopoly.pdf import MissingOCRError, PdfDocument
+from monopoly.statements import CreditStatement, DebitStatement
+from monopoly.statements.base import SafetyCheckError
+
+from webapp.helpers import create_df, format_df, parse_bank_statement, report_memory_usage, show_df
+from webapp.models import DiagnosticKind, DiagnosticLevel, ProcessedFile, TransactionMetadata
+
+
+def test_parse_bank_statement_has_no_diagnostics():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    assert not parse_bank_statement(document).diagnostics
+
+
+def test_parse_bank_statement_reports_failed_safety_check():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    with (
+        patch.object(CreditStatement, "perform_safety_check", side_effect=SafetyCheckError),
+        patch.object(DebitStatement, "perform_safety_check", side_effect=SafetyCheckError),
+    ):
+        processed_file = parse_bank_statement(document)
+
+    assert processed_file.transactions
+    [diagnostic] = processed_file.diagnostics
+    assert diagnostic.kind == DiagnosticKind.SAFETY_CHECK_FAILED
+    assert diagnostic.level == DiagnosticLevel.ERROR
+
+
+def test_parse_bank_statement_can_defer_ocr():
+    scanned = pymupdf.open()
+    scanned.new_page()
+    document = PdfDocument(file_bytes=scanned.tobytes())
+
+    with pytest.raises(MissingOCRError):
+        parse_bank_statement(document, apply_ocr=False)
+
+
+def test_create_df():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    processed_file = parse_bank_statement(document)
+    hlb_file = ProcessedFile(
+        [{"date": "2024-01-02", "description": "PAYMENT", "amount": -10.0, "polarity": "debit"}],
+        TransactionMetadata("HongLeongBank"),
+    )
+
+    df = create_df([processed_file, hlb_file, processed_file])
+
+    assert list(df.columns) == ["date", "description", "amount", "bank"]
+    assert len(df) == len(processed_file.transactions) * 2 + 1
+    assert df["date"].dtype == "datetime64[ns]"
+    assert df["description"].dtype == "string[pyarrow]"
+    assert df["amount"].dtype == "float64"
+    assert list(df["bank"].cat.categories) == ["ExampleBank", "HongLeongBank"]
+    assert df.iloc[len(processed_file.transactions)].tolist() == [
+        pd.Timestamp("2024-01-02"),
+        "PAYMENT",
+        -10.0,
+        "HongLeongBank",
+    ]
+
+
+def test_report_memory_usage():
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    df = create_df([parse_bank_statement(document)])
+
+    with patch("webapp.helpers.logger") as logger:
+        usage = report_memory_usage(df, budget=1024 * 1024)
+        assert 0 < usage < 1024 * 1024
+        logger.warning.assert_not_called()
+
+        report_memory_usage(df, budget=usage - 1)
+        logger.warning.assert_called_once()
+
+
+def test_show_df_reuses_rendered_view():
+    st.session_state.pop("df_view", None)
+    document = PdfDocument(file_path="tests/fixtures/example_statement.pdf")
+    df = create_df([parse_bank_statement(document)])
+
+    with patch("webapp.helpers.format_df", wraps=format_df) as format_df_mock:
+        show_df(df)
+        # a rerun builds an equal frame, which is rendered from the session
+        show_df(df.copy())
+        assert format_df_mock.call_count == 1
+
+        df.loc[0, "amount"] = 1.0
+        show_df(df)
+        assert format_df_mock.call_count == 2
+
+    view = st.session_state["df_view"]
+    assert view.total == df["amount"].sum()
+    # the session's frame is rendered directly, so the view doesn't hold a copy of it
+    assert not any(isinstance(value, pd.DataFrame) for value in vars(view).values())
@@ -0,0 +1,69 @@
+import pytest
+from monopoly.pdf import PdfDocument
+from pdf_builders import build_pdf, show_text
+
+from webapp.banks.hlb import ACCOUNT_TYPE, HongLeongBankParser
+from webapp.fallback_parsers.pdf_text import PdfText, TextItem
+
+COLUMNS = {"date": 30.0, "desc": 100.0, "deposit": 300.0, "withdrawal": 380.0, "balance": 460.0}
+
+
+def row(y: float, **cells: str) -> list[TextItem]:
+    return [TextItem(COLUMNS[column], y, text) for column, text in cells.items()]
+
+
+def page_header(y: float) -> list[TextItem]:
+    # repeated at the top of every page, with a statement date in the date column
+    return [
+        *row(y, desc=ACCOUNT_TYPE),
+        *row(y - 12, date="31-01-2024", desc="Statement Date"),
+    ]
+
+
+def test_parse_continues_table_across_pages():
+    first_page = [
+        *page_header(780),
+        *row(
+            700,
+            date="Date",
+            desc="Transaction Description",
+            deposit="Deposit",
+            withdrawal="Withdrawal",
+            balance="Balance",
+        ),
+        *row(680, date="02-01-2024", desc="SALARY", deposit="5,000.00", balance="5,000.00"),
+        *row(668, desc="ACME SDN BHD"),
+        *row(650, date="03-01-2024", desc="RENT", withdrawal="1,200.00", balance="3,800.00"),
+    ]
+    # continuation pages repeat the page header, but not the table header
+    second_page = [
+        *page_header(780),
+        *row(700, date="15-01-2024", desc="TRANSFER", withdrawal="300.00", balance="3,500.00"),
+        *row(688, desc="TO SAVINGS"),
+        *row(670, desc="Closing Balance", balance="3,500.00"),
+        *row(650, date="20-01-2024", desc="REBATE", deposit="1.00"),
+    ]
+    text = PdfText({0: first_page, 1: second_page})
+
+    assert HongLeongBankParser().parse(text) == [
+        {"date": "2024-01-02", "description": "SALARY ACME SDN BHD", "amount": 5000.0, "polarity": "credit"},
+        {"date": "2024-01-03", "description": "RENT", "amount": -1200.0, "polarity": "debit"},
+        {"date": "2024-01-15", "description": "TRANSFER TO SAVINGS", "amount": -300.0, "polarity": "debit"},
+    ]
+
+
+@pytest.mark.parametrize(
+    ("pages", "expected"),
+    [
+        ([show_text(ACCOUNT_TYPE)], True),
+        ([show_text("HLB PRIMEBIZ") + show_text("CURRENT ACCOUNT")], False),
+        # only the first page is checked
+        ([show_text("Statement"), show_text(ACCOUNT_TYPE)], False),
+        ([show_text("Statement")], False),
+    ],
+)
+def test_is_hlb_document(pages, expected):
+    pdf = build_pdf(*pages)
+    # the text is only in compressed streams, so it isn't found in the raw file
+    assert ACCOUNT_TYPE.encode() not in pdf
+    assert HongLeongBankParser.is_hlb_document(PdfDocument(file_bytes=pdf)) is expected
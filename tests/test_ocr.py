@@ -0,0 +1,126 @@
+from unittest.mock import patch
+
+import pymupdf
+import pytest
+from monopoly.pdf import PdfDocument
+
+from webapp.ocr import ocr_document
+
+
+def create_scanned_pdf(colors: list[tuple[float, float, float]]) -> bytes:
+    pdf = pymupdf.open()
+    for color in colors:
+        page = pdf.new_page()
+        pixmap = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 20, 20), False)
+        pixmap.set_rect(pixmap.irect, tuple(int(c * 255) for c in color))
+        page.insert_image(page.rect, pixmap=pixmap)
+    return pdf.tobytes()
+
+
+def fake_ocrmypdf(pdf_bytes: bytes) -> bytes:
+    """Stand-in for ocrmypdf, which adds a text layer to every page."""
+    pdf = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+    for page in pdf:
+        page.insert_text((50, 50), f"OCR TEXT {page.number}")
+    return pdf.tobytes()
+
+
+@pytest.fixture()
+def run_ocrmypdf():
+    with patch("webapp.ocr.run_ocrmypdf", side_effect=fake_ocrmypdf) as run_ocrmypdf:
+        yield run_ocrmypdf
+
+
+def open_document(pdf_bytes: bytes) -> PdfDocument:
+    document = PdfDocument(file_bytes=pdf_bytes)
+    document._name = "scanned.pdf"
+    return document
+
+
+def test_ocr_document(run_ocrmypdf, monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    document = open_document(create_scanned_pdf([(1, 0, 0), (0, 1, 0)]))
+
+    result = ocr_document(document)
+
+    assert run_ocrmypdf.call_count == 1
+    assert result.name == "scanned.pdf"
+    assert [page.get_text().strip() for page in result] == ["OCR TEXT 0", "OCR TEXT 1"]
+
+
+def test_ocr_cache(run_ocrmypdf, monkeypatch, tmp_path):
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path))
+    pdf_bytes = create_scanned_pdf([(1, 0, 0), (0, 1, 0)])
+
+    ocr_document(open_document(pdf_bytes))
+    assert run_ocrmypdf.call_count == 1
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
+
+    # the same pages are read back from the cache, even in another statement
+    result = ocr_document(open_document(create_scanned_pdf([(0, 1, 0), (1, 0, 0)])))
+    assert run_ocrmypdf.call_count == 1
+    assert [page.get_text().strip() for page in result] == ["OCR TEXT 1", "OCR TEXT 0"]
+
+    # only pages that haven't been seen before are OCR'd
+    ocr_document(open_document(create_scanned_pdf([(1, 0, 0), (0, 0, 1)])))
+    assert run_ocrmypdf.call_count == 2
+    assert pymupdf.open(stream=run_ocrmypdf.call_args.args[0], filetype="pdf").page_count == 1
+
+    # cropping changes the image that Tesseract sees
+    ocr_document(open_document(pdf_bytes), cropbox=(0, 0, 200, 200))
+    assert run_ocrmypdf.call_count == 3
+
+
+def test_only_scanned_pages_are_ocrd(run_ocrmypdf, monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    pdf = pymupdf.open(stream=create_scanned_pdf([(1, 0, 0)]), filetype="pdf")
+    pdf.new_page().insert_text((50, 50), "DIGITAL TRANSACTIONS PAGE")
+    pdf.new_page()
+
+    result = ocr_document(open_document(pdf.tobytes()))
+
+    # the text page and the blank page are left alone
+    [ocr_input] = run_ocrmypdf.call_args.args
+    assert pymupdf.open(stream=ocr_input, filetype="pdf").page_count == 1
+    assert [page.get_text().strip() for page in result] == ["OCR TEXT 0", "DIGITAL TRANSACTIONS PAGE", ""]
+
+
+def test_ocr_page_count_mismatch(monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    document = open_document(create_scanned_pdf([(1, 0, 0), (0, 1, 0)]))
+
+    # pages are matched up by position, so a dropped page mustn't shift the others
+    with (
+        patch("webapp.ocr.run_ocrmypdf", return_value=create_scanned_pdf([(1, 0, 0)])),
+        pytest.raises(ValueError, match="OCR returned 1 pages, expected 2"),
+    ):
+        ocr_document(document)
+
+
+def create_inline_image_pdf() -> bytes:
+    """A scanned page drawn with an inline image, which isn't listed by get_images."""
+    pdf = pymupdf.open()
+    page = pdf.new_page()
+    page.insert_text((50, 50), "placeholder")
+    [xref] = page.get_contents()
+    pdf.update_stream(xref, b"q 100 0 0 100 0 0 cm BI /W 2 /H 2 /CS /G /BPC 8 ID \x00\xff\xff\x00 EI Q")
+    return pdf.tobytes()
+
+
+def test_inline_images_are_ocrd(run_ocrmypdf, monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    document = open_document(create_inline_image_pdf())
+    assert not document[0].get_images()
+
+    result = ocr_document(document)
+    assert [page.get_text().strip() for page in result] == ["OCR TEXT 0"]
+
+
+def test_pages_without_text_are_ocrd_if_none_look_scanned(run_ocrmypdf, monkeypatch):
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    pdf = pymupdf.open()
+    pdf.new_page()
+    pdf.new_page().insert_text((50, 50), "DIGITAL TRANSACTIONS PAGE")
+
+    result = ocr_document(open_document(pdf.tobytes()))
+    assert [page.get_text().strip() for page in result] == ["OCR TEXT 0", "DIGITAL TRANSACTIONS PAGE"]
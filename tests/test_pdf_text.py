@@ -0,0 +1,300 @@
+import random
+import zlib
+from unittest.mock import patch
+
+import pymupdf
+import pytest
+from pdf_builders import build_raw_pdf, page_tree, show_text, stream_object
+
+from webapp.fallback_parsers import pdf_text
+from webapp.fallback_parsers.pdf_text import (
+    PdfText,
+    TextItem,
+    _iter_decoded_chunks,
+    _iter_text_items,
+    _PdfObject,
+    _tokenize_pdf_content_stream,
+    _tokenize_pdf_content_stream_chunks,
+    contains_text,
+    extract_text,
+    group_text_items_into_rows,
+)
+
+WHITESPACE = b" \t\r\n\x0c\x00"
+DELIMITERS = b"()[]<>{}/%"
+
+
+def reference_tokenize(data: bytes):
+    """Byte-by-byte tokenizer that the regex tokenizer replaced."""
+    i = 0
+    while i < len(data):
+        c = data[i]
+        if c in WHITESPACE:
+            i += 1
+            continue
+        if c == 0x25:
+            j = data.find(b"\n", i)
+            if j == -1:
+                return
+            i = j + 1
+            continue
+        if c in (0x28, 0x5B):
+            kind, open_char, close_char = ("str", 0x28, 0x29) if c == 0x28 else ("arr", 0x5B, 0x5D)
+            depth = 1
+            i += 1
+            buf = bytearray()
+            while i < len(data) and depth > 0:
+                ch = data[i]
+                if ch == 0x5C:
+                    buf.append(ch)
+                    i += 1
+                    if i < len(data):
+                        buf.append(data[i])
+                        i += 1
+                    continue
+                if ch == open_char:
+                    depth += 1
+                elif ch == close_char:
+                    depth -= 1
+                    if depth == 0:
+                        i += 1
+                        break
+                buf.append(ch)
+                i += 1
+            yield (kind, bytes(buf))
+            continue
+
+        j = i + 1 if c == 0x2F else i
+        while j < len(data) and data[j] not in WHITESPACE and data[j] not in DELIMITERS:
+            j += 1
+        j = max(j, i + 1)
+        yield ("name" if c == 0x2F else "tok", data[i:j])
+        i = j
+
+
+def fixture_content_streams() -> list[bytes]:
+    document = pymupdf.open("tests/fixtures/example_statement.pdf")
+    return [document.xref_stream(xref) for page in document for xref in page.get_contents()]
+
+
+def random_content_streams(count: int) -> list[bytes]:
+    rng = random.Random(0)
+    alphabet = WHITESPACE + DELIMITERS + b"\\abcTjBTETm0123456789.-+"
+    return [bytes(rng.choice(alphabet) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+EDGE_CASES = [
+    b"BT 1 0 0 1 10 20 Tm (Hello \\(World\\)) Tj ET",
+    b"BT [(Nested (parens) here) -20 (b)] TJ ET",
+    b"[[1 2] [3]] (unterminated",
+    b"/Name/Other<</A 1>>BDC <48656c6c6f> Tj EMC",
+    b"(trailing escape \\",
+    b"% comment without newline",
+    b"1 2 Td % comment\n(text) Tj",
+]
+
+
+def assert_tokens_match_reference(stream: bytes):
+    expected = list(reference_tokenize(stream))
+    assert list(_tokenize_pdf_content_stream(stream)) == expected
+
+    for size in (1, 3, 64):
+        chunks = [stream[i : i + size] for i in range(0, len(stream), size)]
+        assert list(_tokenize_pdf_content_stream_chunks(chunks)) == expected
+
+
+@pytest.mark.parametrize("stream", EDGE_CASES + fixture_content_streams())
+def test_tokenizer_matches_reference(stream):
+    assert_tokens_match_reference(stream)
+
+
+def test_tokenizer_matches_reference_on_random_streams():
+    for stream in random_content_streams(2000):
+        assert_tokens_match_reference(stream)
+
+
+def split_chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+LONG_TOKENS = [
+    # inline image data, which is one long token
+    b"BT (a) Tj ET BI /W 4 ID " + bytes(random.Random(0).getrandbits(8) for _ in range(5000)) + b" EI (b) Tj",
+    # strings that are never closed
+    b"BT (a) Tj ET " + b"((" * 500 + b"x" * 3000,
+    b"[(" + b"\\(" * 2000 + b") Tj",
+    b"BT (" + b"x" * 4000 + b") Tj [(" + b"y" * 4000 + b")] TJ ET",
+]
+
+
+@pytest.mark.parametrize("stream", LONG_TOKENS)
+def test_tokens_split_across_chunks(stream):
+    expected = list(_tokenize_pdf_content_stream(stream))
+    for size in (1, 7, 100, 1024):
+        assert list(_tokenize_pdf_content_stream_chunks(split_chunks(stream, size))) == expected
+
+
+def test_long_tokens_are_not_rescanned_per_chunk():
+    stream = b"BI /W 4 ID " + b"x" * 100_000
+    with patch("webapp.fallback_parsers.pdf_text._scan_tokens", wraps=pdf_text._scan_tokens) as scan:
+        list(_tokenize_pdf_content_stream_chunks(split_chunks(stream, 100)))
+
+    # the carried token is rescanned each time the buffer doubles, not for each of the 1000 chunks
+    assert scan.call_count < 20
+
+
+def test_decoded_chunks():
+    content = b"".join(b"BT 1 0 0 1 %d 700 Tm (item %d) Tj ET\n" % (i, i) for i in range(5000))
+    compressed = _PdfObject(b"<< /Filter /FlateDecode >>", memoryview(zlib.compress(content)))
+    plain = _PdfObject(b"<< >>", memoryview(content))
+
+    with patch("webapp.fallback_parsers.pdf_text._STREAM_CHUNK_SIZE", 1000):
+        for obj in (compressed, plain):
+            chunks = list(_iter_decoded_chunks(obj))
+            assert len(chunks) > 1
+            assert all(len(chunk) <= 1000 for chunk in chunks)
+            assert b"".join(chunks) == content
+
+        # corrupt data stops decoding instead of raising
+        corrupt = _PdfObject(compressed.body, memoryview(zlib.compress(content)[:50] + b"\xff" * 50))
+        assert content.startswith(b"".join(_iter_decoded_chunks(corrupt)))
+
+
+def reference_group_rows(items: list[TextItem], y_tolerance: float = 1.8):
+    """Row clustering that compared each item against every existing row."""
+    rows: dict[float, list[TextItem]] = {}
+    for item in sorted(items, key=lambda t: (-t.y, t.x)):
+        key = next((ky for ky in rows if abs(ky - item.y) <= y_tolerance), item.y)
+        rows.setdefault(key, []).append(item)
+    return {y: sorted(row_items, key=lambda t: t.x) for y, row_items in rows.items()}
+
+
+def test_group_rows_matches_reference():
+    rng = random.Random(0)
+    for _ in range(500):
+        items = [
+            TextItem(x=rng.uniform(0, 100), y=rng.choice([rng.uniform(0, 30), float(rng.randint(0, 30))]), text=str(i))
+            for i in range(rng.randint(0, 40))
+        ]
+        rows = group_text_items_into_rows(items)
+        expected = reference_group_rows(items)
+        assert list(rows) == list(expected)
+        assert rows == expected
+
+
+def test_rows_are_grouped_per_page():
+    text = PdfText(
+        {
+            0: [TextItem(x=20, y=700, text="b"), TextItem(x=10, y=700.5, text="a")],
+            1: [TextItem(x=10, y=700, text="c")],
+        }
+    )
+    assert {page: [[t.text for t in row] for row in rows.values()] for page, rows in text.page_rows.items()} == {
+        0: [["a", "b"]],
+        1: [["c"]],
+    }
+    assert [t.text for t in text.items] == ["b", "a", "c"]
+    assert text.contains("c")
+
+
+def page_texts(pdf: bytes) -> dict[int, list[str]]:
+    return {page: [item.text for item in items] for page, items in extract_text(pdf).pages.items()}
+
+
+def test_stream_with_direct_length():
+    # the stream data contains "endstream", so only /Length finds its end
+    data = show_text("endstream")
+    assert page_texts(build_raw_pdf(page_tree(stream_object(data)))) == {0: ["endstream"]}
+
+
+def test_stream_with_indirect_length():
+    data = show_text("endstream")
+    objects = {5: b"%d" % len(data), **page_tree(stream_object(data, b"/Length 5 0 R"))}
+    assert page_texts(build_raw_pdf(objects)) == {0: ["endstream"]}
+
+
+@pytest.mark.parametrize("dictionary", [b"/Length 3", b"/Length 100000", b"/Length 9 0 R", b""])
+def test_stream_with_wrong_or_missing_length(dictionary):
+    # the stream end falls back to the next endstream keyword
+    pdf = build_raw_pdf(page_tree(stream_object(show_text("first"), dictionary), stream_object(show_text("second"))))
+    assert page_texts(pdf) == {0: ["first"], 1: ["second"]}
+
+
+def test_flate_stream():
+    data = zlib.compress(show_text("compressed"))
+    content = stream_object(data, b"/Length %d /Filter /FlateDecode" % len(data))
+    assert page_texts(build_raw_pdf(page_tree(content))) == {0: ["compressed"]}
+
+
+def test_objects_in_object_streams():
+    objects = page_tree(stream_object(show_text("page one")), stream_object(show_text("page two")))
+    # the catalog, page tree and pages are stored inside a compressed object stream
+    stored = [1, 2, 10, 11]
+    offsets, data = [], b""
+    for num in stored:
+        offsets.append(b"%d %d" % (num, len(data)))
+        data += objects.pop(num) + b"\n"
+    header = b" ".join(offsets) + b"\n"
+    compressed = zlib.compress(header + data)
+    objects[30] = stream_object(
+        compressed,
+        b"/Type /ObjStm /N %d /First %d /Length %d /Filter /FlateDecode" % (len(stored), len(header), len(compressed)),
+    )
+
+    assert page_texts(build_raw_pdf(objects)) == {0: ["page one"], 1: ["page two"]}
+
+
+def test_nested_page_tree_sets_page_order():
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 12 0 R] /Count 3 >>",
+        3: b"<< /Type /Pages /Parent 2 0 R /Kids [11 0 R 10 0 R] /Count 2 >>",
+        # pages are defined in a different order to the one the tree gives them
+        10: b"<< /Type /Page /Parent 3 0 R /Contents 20 0 R >>",
+        11: b"<< /Type /Page /Parent 3 0 R /Contents 21 0 R >>",
+        12: b"<< /Type /Page /Parent 2 0 R /Contents 22 0 R >>",
+        20: stream_object(show_text("second")),
+        21: stream_object(show_text("first")),
+        22: stream_object(show_text("third")),
+    }
+    assert page_texts(build_raw_pdf(objects)) == {0: ["first"], 1: ["second"], 2: ["third"]}
+
+
+def test_contents_array():
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [10 0 R 11 0 R] /Count 2 >>",
+        10: b"<< /Type /Page /Parent 2 0 R /Contents [20 0 R 21 0 R] >>",
+        # the second page refers to an array object of content streams
+        11: b"<< /Type /Page /Parent 2 0 R /Contents 22 0 R >>",
+        22: b"[23 0 R 24 0 R]",
+        20: stream_object(show_text("a", 700)),
+        21: stream_object(show_text("b", 650)),
+        23: stream_object(show_text("c", 700)),
+        24: stream_object(show_text("d", 650)),
+    }
+    assert page_texts(build_raw_pdf(objects)) == {0: ["a", "b"], 1: ["c", "d"]}
+
+
+ACCOUNT_TYPE = "HLB PRIMEBIZ CURRENT ACCOUNT"
+
+
+@pytest.mark.parametrize(
+    ("stream", "expected"),
+    [
+        (show_text(ACCOUNT_TYPE), True),
+        (b"BT [(x) -20 (HLB PRIMEBIZ CURRENT ACCOUNT)] TJ ET", True),
+        # escaped characters, so the raw bytes of the text aren't in the stream
+        (b"BT (HLB PRIMEBIZ \\103URRENT ACCOUNT) Tj ET", True),
+        # the raw bytes are in the stream, but aren't shown as text
+        (b"% HLB PRIMEBIZ CURRENT ACCOUNT\n", False),
+        (b"(HLB PRIMEBIZ CURRENT ACCOUNT) Tj", False),
+        (b"BT (HLB PRIMEBIZ) Tj (CURRENT ACCOUNT) Tj ET", False),
+        (b"", False),
+    ],
+)
+def test_contains_text(stream, expected):
+    # the precheck on raw bytes must agree with tokenizing every stream
+    tokens = _tokenize_pdf_content_stream(stream)
+    assert any(ACCOUNT_TYPE in item.text for item in _iter_text_items(tokens)) is expected
+    assert contains_text([show_text("other"), stream], ACCOUNT_TYPE) is expected
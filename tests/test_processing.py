@@ -0,0 +1,33 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from webapp.processing import ReplaceableExecutor, discard_executor, get_executor
+
+
+def test_broken_executor_is_replaced():
+    get_executor.cache_clear()
+    executor = get_executor(2)
+
+    # a worker that dies, as it would on a segfault, breaks the whole pool
+    with pytest.raises(BrokenProcessPool):
+        executor.submit(os._exit, 1).result()
+    assert get_executor(2) is executor
+
+    discard_executor(get_executor, 2, executor)
+    try:
+        assert get_executor(2) is not executor
+        assert get_executor(2).submit(abs, -1).result() == 1
+    finally:
+        get_executor(2).shutdown()
+        get_executor.cache_clear()
+
+
+def test_replaceable_executor():
+    with ReplaceableExecutor(1) as executor:
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(os._exit, 1).result()
+
+        # the next submit starts a new pool rather than failing
+        assert executor.submit(abs, -1).result() == 1
@@ -0,0 +1,85 @@
+"""Cash flow aggregates of the session's transactions, for the visualizations page."""
+
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from webapp.helpers import get_df_fingerprint
+
+# granularity -> (pandas period, frequency of the periods' start dates)
+GRANULARITIES = {
+    "Day": ("D", "D"),
+    "Week": ("W", "W-MON"),
+    "Month": ("M", "MS"),
+    "Year": ("Y", "YS"),
+}
+
+
+@dataclass
+class CashFlowCube:
+    """
+    Income, expenses and savings summed per bank and period, at every granularity.
+
+    Each level is indexed by (period, bank), where periods are labelled by their
+    start date. Charts read from the levels, so changing the granularity or the
+    banks shown never re-scans the transactions.
+    """
+
+    levels: dict[str, pd.DataFrame]
+    banks: list[str]
+
+    def get(self, granularity: str, banks: list[str] | None = None) -> pd.DataFrame:
+        """Cash flow per period for the given banks, with empty periods filled in."""
+        level = self.levels[granularity]
+        if banks is not None:
+            level = level[level.index.get_level_values("bank").isin(banks)]
+
+        cash_flow = level.groupby(level="period").sum()
+        if cash_flow.empty:
+            return cash_flow
+
+        _, frequency = GRANULARITIES[granularity]
+        periods = pd.date_range(cash_flow.index.min(), cash_flow.index.max(), freq=frequency, name="period")
+        return cash_flow.reindex(periods, fill_value=0)
+
+
+def build_cash_flow_cube(df: pd.DataFrame) -> CashFlowCube:
+    """
+    Aggregate a transactions frame into a cash flow cube.
+
+    Transactions are scanned once into daily sums, and coarser granularities
+    are summed from the daily ones. Only the dates, amounts and banks are read,
+    so the transactions frame isn't copied.
+    """
+    amounts = df["amount"]
+    daily = pd.DataFrame(
+        {
+            "period": df["date"].dt.normalize().to_numpy(),
+            "bank": df["bank"].to_numpy(),
+            "Income": amounts.clip(lower=0).to_numpy(),
+            "Expenses": (-amounts).clip(lower=0).to_numpy(),
+            "Savings": amounts.to_numpy(),
+        }
+    )
+    daily = daily.groupby(["period", "bank"], observed=True).sum()
+
+    levels = {"Day": daily}
+    days = pd.DatetimeIndex(daily.index.get_level_values("period"))
+    for granularity, (period, _) in GRANULARITIES.items():
+        if granularity == "Day":
+            continue
+        starts = days.to_period(period).start_time.rename("period")
+        levels[granularity] = daily.groupby([starts, daily.index.get_level_values("bank")], observed=True).sum()
+
+    return CashFlowCube(levels, sorted(daily.index.get_level_values("bank").unique()))
+
+
+def get_cash_flow_cube(df: pd.DataFrame) -> CashFlowCube:
+    """Build the cash flow cube of a frame, unless its transactions were already aggregated."""
+    fingerprint = get_df_fingerprint(df)
+    cached: tuple[str, CashFlowCube] | None = st.session_state.get("cash_flow_cube")
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, build_cash_flow_cube(df))
+        st.session_state["cash_flow_cube"] = cached
+    return cached[1]
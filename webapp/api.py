@@ -0,0 +1,190 @@
+"""
+HTTP API for converting statements without the Streamlit interface.
+
+e.g. curl -F file=@statement.pdf -F password=pass123 "localhost:8502/convert?format=csv"
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import sys
+from concurrent.futures import Executor, Future
+from http import HTTPStatus
+
+import pandas as pd
+from monopoly.pdf import PdfPasswords
+from pydantic import SecretStr
+from tornado.httputil import HTTPFile
+from tornado.web import Application, HTTPError, RequestHandler
+
+from webapp.config import AppConfig
+from webapp.export import EXPORT_FORMATS, iter_csv_chunks
+from webapp.helpers import create_df, format_df
+from webapp.models import ProcessedFile
+from webapp.processing import ReplaceableExecutor, parse_file
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("json", *EXPORT_FORMATS)
+
+
+class ConvertHandler(RequestHandler):
+    """
+    Convert uploaded statements, sent as multipart `file` fields.
+
+    Optional `password` fields are tried alongside PDF_PASSWORDS to unlock
+    encrypted files. Files are parsed in the process pool; the event loop only
+    waits on the results, so slow statements don't block other requests.
+    """
+
+    def initialize(self, executor: Executor, slots: asyncio.Semaphore, timeout: float):
+        self.executor = executor
+        self.slots = slots
+        self.timeout = timeout
+
+    async def post(self):
+        output_format = self.get_argument("format", "json")
+        if output_format not in OUTPUT_FORMATS:
+            raise HTTPError(400, reason=f"format must be one of {', '.join(OUTPUT_FORMATS)}")
+
+        uploads = self.request.files.get("file", [])
+        if not uploads:
+            raise HTTPError(400, reason="no files uploaded")
+
+        # reject rather than queue requests once the pool is saturated,
+        # so that callers can back off instead of piling up on the server
+        if self.slots.locked():
+            raise HTTPError(503, reason="too many conversions in progress")
+
+        passwords = PdfPasswords().pdf_passwords + [SecretStr(p) for p in self.get_body_arguments("password")]
+        results = await self.parse_uploads(uploads, passwords)
+        await self.write_results(output_format, uploads, results)
+
+    async def parse_uploads(
+        self, uploads: list[HTTPFile], passwords: list[SecretStr]
+    ) -> list[ProcessedFile | BaseException]:
+        await self.slots.acquire()
+        futures: list[Future[ProcessedFile]] = []
+        try:
+            futures.extend(
+                self.executor.submit(parse_file, upload.body, upload.filename, passwords) for upload in uploads
+            )
+        finally:
+            # the slot is held until every submitted file is done with its worker,
+            # even after a timeout, so that timed out requests still count as busy;
+            # if a submit fails, it's released once the files before it are done
+            parsed = asyncio.gather(*map(asyncio.wrap_future, futures), return_exceptions=True)
+            parsed.add_done_callback(lambda _: self.slots.release())
+        try:
+            results = await asyncio.wait_for(asyncio.shield(parsed), self.timeout)
+        # asyncio.TimeoutError is only the builtin TimeoutError from Python 3.11
+        except asyncio.TimeoutError:  # noqa: UP041
+            # files that are already being parsed run to completion in
+            # their worker, but queued files are dropped from the pool
+            for future in futures:
+                future.cancel()
+            raise HTTPError(504, reason="conversion timed out") from None
+        return results
+
+    async def write_results(
+        self, output_format: str, uploads: list[HTTPFile], results: list[ProcessedFile | BaseException]
+    ) -> None:
+        errors = {}
+        processed_files: list[tuple[str, ProcessedFile]] = []
+        for upload, result in zip(uploads, results, strict=True):
+            if isinstance(result, BaseException):
+                logger.error("Failed to parse bank statement for %s", upload.filename, exc_info=result)
+                errors[upload.filename] = str(result) or type(result).__name__
+            else:
+                processed_files.append((upload.filename, result))
+
+        if output_format in EXPORT_FORMATS:
+            if errors:
+                self.set_status(422)
+                self.write({"errors": errors})
+                return
+            df = format_df(create_df([processed_file for _, processed_file in processed_files]))
+            if output_format == "csv":
+                await self.write_csv(df)
+            else:
+                self.set_header("Content-Type", EXPORT_FORMATS[output_format].mime)
+                self.write(EXPORT_FORMATS[output_format].export(df))
+            return
+
+        if not processed_files:
+            self.set_status(422)
+        self.write(
+            {
+                "files": [serialize_file(file_name, processed_file) for file_name, processed_file in processed_files],
+                "errors": errors,
+            }
+        )
+
+    async def write_csv(self, df: pd.DataFrame) -> None:
+        """Stream the transactions as CSV, so that large exports start arriving right away."""
+        self.set_header("Content-Type", "text/csv; charset=utf-8")
+        for chunk in iter_csv_chunks(df):
+            self.write(chunk)
+            await self.flush()
+
+    def write_error(self, status_code: int, **_kwargs):
+        if status_code == HTTPStatus.SERVICE_UNAVAILABLE:
+            self.set_header("Retry-After", "1")
+        self.finish({"error": self._reason})
+
+
+def serialize_file(file_name: str, processed_file: ProcessedFile) -> dict:
+    transactions = []
+    if processed_file.transactions:
+        df = create_df([processed_file])
+        transactions = [
+            {"date": row.date.date().isoformat(), "description": row.description, "amount": row.amount}
+            for row in df.itertuples(index=False)
+        ]
+
+    return {
+        "file": file_name,
+        "bank": processed_file.metadata.bank_name,
+        "transactions": transactions,
+        "diagnostics": [
+            {"kind": diagnostic.kind.value, "level": diagnostic.level.value, "message": diagnostic.message}
+            for diagnostic in processed_file.diagnostics
+        ],
+    }
+
+
+def make_app(executor: Executor, config: AppConfig | None = None) -> Application:
+    config = config or AppConfig()
+    handler_kwargs = {
+        "executor": executor,
+        "slots": asyncio.Semaphore(config.api_max_concurrent_requests),
+        "timeout": config.api_request_timeout,
+    }
+    return Application([(r"/convert", ConvertHandler, handler_kwargs)])
+
+
+async def serve(host: str, port: int) -> None:
+    config = AppConfig()
+    # the pool is replaced whenever a worker dies, e.g. on a segfault or an OOM kill
+    with ReplaceableExecutor(max(config.parse_workers, 1)) as executor:
+        app = make_app(executor, config)
+        app.listen(port, address=host)
+        logger.info("Listening on http://%s:%d", host, port)
+        await asyncio.Event().wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="statement-sensei-api", description="HTTP API for bank statement conversion")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
 import logging
 import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 
 # CRITICAL: Fix sys.path BEFORE any other imports
@@ -13,17 +18,26 @@ if str(_REPO_ROOT) not in sys.path:
 import pandas as pd
 import streamlit as st
 from monopoly.generic.generic import GenericParserError
-from monopoly.pdf import MissingPasswordError, PdfDocument
+from monopoly.pdf import MissingOCRError, MissingPasswordError, PdfDocument, PdfPasswords
+from pydantic import SecretStr
+from streamlit.delta_generator import DeltaGenerator
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+from webapp.aggregates import get_cash_flow_cube
+from webapp.cache import get_cache_key, get_parse_cache
+from webapp.config import AppConfig
 from webapp.constants import APP_DESCRIPTION
-from webapp.helpers import create_df, parse_bank_statement, show_df
+from webapp.helpers import create_df, parse_bank_statement, report_memory_usage, show_df, show_diagnostics
 from webapp.logo import logo
 from webapp.models import ProcessedFile, TransactionMetadata
+from webapp.processing import discard_executor, get_executor, get_ocr_executor, parse_file
 
 # number of files that need to be added before progress bar appears
 PBAR_MIN_FILES = 4
 
+# seconds between checks for statements that have finished OCR
+OCR_POLL_INTERVAL = 2
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +51,8 @@ def app() -> pd.DataFrame:
     df = None
     if files:
         st.session_state.pop("df", None)
+    else:
+        prune_ocr_jobs(keep=set())
 
     if "df" in st.session_state and not files:
         df = st.session_state["df"]
@@ -46,89 +62,285 @@ def app() -> pd.DataFrame:
 
         if processed_files:
             df = create_df(processed_files)
+            report_memory_usage(df, AppConfig().session_memory_budget_bytes)
+            st.session_state["df"] = df
+            # aggregated up front, so the visualizations page only reads the cube
+            get_cash_flow_cube(df)
 
     if df is not None:
         show_df(df)
 
+    if st.session_state.get("ocr_jobs"):
+        poll_ocr_jobs()
+
     return df
 
 
+@dataclass
+class UploadBatch:
+    """
+    State of a single pass over the uploaded files.
+
+    Parsed files are slotted back into `results` by upload index, so that
+    results from the process pool keep the same order as the uploads.
+    """
+
+    results: list[ProcessedFile | None]
+    parse_workers: int
+    # the parse pool, which is dropped if it breaks partway through the uploads
+    executor: ProcessPoolExecutor | None
+    pending: dict[Future[ProcessedFile], tuple[int, str, str]] = field(default_factory=dict)
+    cache_keys: set[str] = field(default_factory=set)
+    skipped_files: int = 0
+
+    def set_result(self, i: int, processed_file: ProcessedFile | None) -> None:
+        self.results[i] = processed_file
+        if processed_file is None:
+            self.skipped_files += 1
+
+
 def process_files(uploaded_files: list[UploadedFile]) -> list[ProcessedFile] | None:
     num_files = len(uploaded_files)
     show_pbar = num_files > PBAR_MIN_FILES
 
     pbar = st.progress(0, text="Processing PDFs") if show_pbar else None
 
-    processed_files: list[ProcessedFile] = []
-    skipped_files = 0
+    parse_workers = AppConfig().parse_workers
+    batch = UploadBatch([None] * num_files, parse_workers, get_executor(parse_workers))
     for i, file in enumerate(uploaded_files):
-        if pbar:
+        if pbar and not batch.executor:
             pbar.progress(i / num_files, text=f"Processing {file.name}")
+        process_file(batch, i, file)
 
-        try:
-            file_bytes = file.getvalue()
-            document = PdfDocument(file_bytes=file_bytes)
-            document._name = file.name
-        except Exception:
-            logger.exception("Failed to load uploaded PDF %s", getattr(file, "name", "<unknown>"))
-            st.error(f"Couldn't read {file.name} as a PDF.")
-            skipped_files += 1
-            continue
-
-        # attempt to use passwords stored in environment to unlock
-        # if no passwords in environment, then ask user for password
-        if document.is_encrypted:  # pylint: disable=no-member
-            try:
-                document = document.unlock_document()
-
-            except MissingPasswordError:
-                document = handle_encrypted_document(document)
-
-        if document:
-            processed_file = handle_file(document, file_bytes)
-            if processed_file is not None:
-                processed_files.append(processed_file)
-            else:
-                skipped_files += 1
+    collect_results(batch, uploaded_files, pbar)
+    prune_ocr_jobs(keep=batch.cache_keys)
 
     if pbar:
         pbar.empty()
 
-    if skipped_files:
-        st.warning(f"Skipped {skipped_files} file(s) due to parsing errors.")
+    if batch.skipped_files:
+        st.warning(f"Skipped {batch.skipped_files} file(s) due to parsing errors.")
 
+    processed_files = [processed_file for processed_file in batch.results if processed_file is not None]
+    for processed_file in processed_files:
+        show_diagnostics(processed_file)
     return processed_files
 
 
-def handle_file(document: PdfDocument, file_bytes: bytes) -> ProcessedFile | None:
-    cache_key: str | None
+def process_file(batch: UploadBatch, i: int, file: UploadedFile) -> None:
+    """Parse an upload, or submit it to the process pool, unless it was parsed before."""
     try:
-        document_id = document.xref_get_key(-1, "ID")[-1]
-        cache_key = document.name + document_id
+        # a zero-copy view of the upload, shared by PyMuPDF and our own parsers
+        file_bytes = file.getbuffer()
+        document = PdfDocument(file_bytes=file_bytes)
+        document._name = file.name
     except Exception:
-        cache_key = None
+        logger.exception("Failed to load uploaded PDF %s", getattr(file, "name", "<unknown>"))
+        st.error(f"Couldn't read {file.name} as a PDF.")
+        batch.skipped_files += 1
+        return
+
+    # attempt to use passwords stored in environment to unlock
+    # if no passwords in environment, then ask user for password
+    if document.is_encrypted:  # pylint: disable=no-member
+        try:
+            document = document.unlock_document()
+
+        except MissingPasswordError:
+            document = handle_encrypted_document(document)
+
+    if not document:
+        return
+
+    cache_key = get_cache_key(file_bytes)
+    batch.cache_keys.add(cache_key)
+    if (cached_file := get_cached_file(cache_key)) is not None:
+        batch.results[i] = cached_file
+        return
+
+    # statements being OCR'd are left out until their job finishes
+    if cache_key in st.session_state.setdefault("ocr_jobs", {}):
+        collect_ocr_job(batch, i, document.name, cache_key)
+        return
+
+    if batch.executor and submit_file(batch, i, file_bytes, document.name, cache_key):
+        return
+
+    try:
+        batch.set_result(i, handle_file(document, cache_key))
+    except MissingOCRError:
+        submit_ocr_job(file_bytes, document.name, cache_key)
+
 
-    if cache_key and cache_key in st.session_state:
+def submit_file(batch: UploadBatch, i: int, file_bytes: memoryview, file_name: str, cache_key: str) -> bool:
+    """Submit an upload to the parse pool, returning False if the pool is broken."""
+    try:
+        future = batch.executor.submit(parse_file, bytes(file_bytes), file_name, get_passwords(), apply_ocr=False)
+    except BrokenProcessPool:
+        # the remaining files are parsed on the script thread, and the next run gets a new pool
+        discard_executor(get_executor, batch.parse_workers, batch.executor)
+        batch.executor = None
+        return False
+
+    batch.pending[future] = (i, file_name, cache_key)
+    return True
+
+
+def collect_results(batch: UploadBatch, uploaded_files: list[UploadedFile], pbar: DeltaGenerator | None) -> None:
+    """Wait for the files submitted to the parse pool, handing scanned statements over to OCR."""
+    for completed, future in enumerate(as_completed(batch.pending), start=1):
+        i, file_name, cache_key = batch.pending[future]
+        if pbar:
+            pbar.progress(completed / len(batch.pending), text=f"Processed {file_name}")
+
+        # a worker died and took the pool with it, which fails every file it still had
+        if isinstance(future.exception(), BrokenProcessPool):
+            discard_executor(get_executor, batch.parse_workers, get_executor(batch.parse_workers))
+
+        try:
+            batch.set_result(i, handle_future(future, file_name, cache_key))
+        except MissingOCRError:
+            submit_ocr_job(uploaded_files[i].getbuffer(), file_name, cache_key)
+
+
+def collect_ocr_job(batch: UploadBatch, i: int, file_name: str, cache_key: str) -> None:
+    """Take the result of a statement's OCR job, once it has finished."""
+    ocr_jobs: dict[str, tuple[Future[ProcessedFile], str]] = st.session_state["ocr_jobs"]
+    future, _ = ocr_jobs[cache_key]
+    if future.done():
+        del ocr_jobs[cache_key]
+        batch.set_result(i, handle_ocr_future(future, file_name, cache_key))
+
+
+def get_cached_file(cache_key: str) -> ProcessedFile | None:
+    if cache_key in st.session_state:
         return st.session_state[cache_key]
 
+    if parse_cache := get_parse_cache():
+        processed_file = parse_cache.get(cache_key)
+        if processed_file is not None:
+            st.session_state[cache_key] = processed_file
+        return processed_file
+
+    return None
+
+
+def cache_file(cache_key: str, processed_file: ProcessedFile) -> None:
+    st.session_state[cache_key] = processed_file
+    if parse_cache := get_parse_cache():
+        parse_cache.put(cache_key, processed_file)
+
+
+def get_passwords() -> list[SecretStr]:
+    """Passwords that a worker process can use to unlock a document."""
+    session_passwords = [SecretStr(password) for password in st.session_state.get("pdf_passwords", [])]
+    return PdfPasswords().pdf_passwords + session_passwords
+
+
+@lru_cache(maxsize=1)
+def get_ocr_queue(size: int) -> threading.BoundedSemaphore:
+    """Return the slots for OCR jobs that are queued or running, shared across sessions."""
+    return threading.BoundedSemaphore(size)
+
+
+def submit_ocr_job(file_bytes: memoryview, file_name: str, cache_key: str) -> None:
+    """Add an OCR layer to a statement and parse it in the background."""
+    config = AppConfig()
+    queue = get_ocr_queue(config.ocr_queue_size)
+    if not queue.acquire(blocking=False):
+        st.warning(f"Too many statements are waiting for OCR. Please upload {file_name} again later.")
+        return
+
     try:
-        processed_file = parse_bank_statement(document)
-    except GenericParserError:
-        logger.exception("Generic parser failed for %s", document.name)
-        st.error(
-            f"Couldn't parse {document.name}. This statement format isn't supported yet.",
-        )
-        return None
+        future = submit_to_ocr_pool(config.ocr_workers, bytes(file_bytes), file_name, get_passwords())
     except Exception:
-        logger.exception("Failed to parse bank statement for %s", document.name)
-        st.error(f"Couldn't parse {document.name}.")
+        queue.release()
+        raise
+
+    # cancelled jobs are done too, so pruning a job frees its slot
+    future.add_done_callback(lambda _: queue.release())
+    st.session_state["ocr_jobs"][cache_key] = (future, file_name)
+
+
+def submit_to_ocr_pool(workers: int, *args) -> Future[ProcessedFile]:
+    executor = get_ocr_executor(workers)
+    try:
+        return executor.submit(parse_file, *args)
+    except BrokenProcessPool:
+        # the pool broke when one of its workers died, so the job goes to a new one
+        discard_executor(get_ocr_executor, workers, executor)
+        return get_ocr_executor(workers).submit(parse_file, *args)
+
+
+def prune_ocr_jobs(keep: set[str]) -> None:
+    """Cancel OCR jobs for statements that are no longer uploaded."""
+    ocr_jobs: dict[str, tuple[Future[ProcessedFile], str]] = st.session_state.get("ocr_jobs", {})
+    for cache_key in list(ocr_jobs):
+        if cache_key not in keep:
+            future, _ = ocr_jobs.pop(cache_key)
+            future.cancel()
+
+
+@st.fragment(run_every=OCR_POLL_INTERVAL)
+def poll_ocr_jobs() -> None:
+    """Rerun the app whenever a background OCR job finishes, so its transactions are shown."""
+    ocr_jobs: dict[str, tuple[Future[ProcessedFile], str]] = st.session_state.get("ocr_jobs", {})
+    if any(future.done() for future, _ in ocr_jobs.values()):
+        st.rerun()
+
+    file_names = ", ".join(file_name for _, file_name in ocr_jobs.values())
+    st.info(f"No text found - adding OCR layer for {file_names}. Transactions will appear once it finishes.")
+
+
+def handle_file(document: PdfDocument, cache_key: str) -> ProcessedFile | None:
+    try:
+        processed_file = parse_bank_statement(document, apply_ocr=False)
+    except MissingOCRError:
+        raise
+    # any parser failure is reported against its file, rather than failing the upload
+    except Exception as err:  # noqa: BLE001
+        show_parse_error(document.name, err)
         return None
 
-    if cache_key:
-        st.session_state[cache_key] = processed_file
+    cache_file(cache_key, processed_file)
     return processed_file
 
 
+def handle_future(future: Future[ProcessedFile], file_name: str, cache_key: str) -> ProcessedFile | None:
+    try:
+        processed_file = future.result()
+    except MissingOCRError:
+        raise
+    # any parser failure is reported against its file, rather than failing the upload
+    except Exception as err:  # noqa: BLE001
+        show_parse_error(file_name, err)
+        return None
+
+    cache_file(cache_key, processed_file)
+    return processed_file
+
+
+def show_parse_error(file_name: str, err: Exception) -> None:
+    if isinstance(err, GenericParserError):
+        logger.error("Generic parser failed for %s", file_name, exc_info=err)
+        st.error(
+            f"Couldn't parse {file_name}. This statement format isn't supported yet.",
+        )
+        return
+
+    logger.error("Failed to parse bank statement for %s", file_name, exc_info=err)
+    st.error(f"Couldn't parse {file_name}.")
+
+
+def handle_ocr_future(future: Future[ProcessedFile], file_name: str, cache_key: str) -> ProcessedFile | None:
+    try:
+        return handle_future(future, file_name, cache_key)
+    except MissingOCRError as err:
+        # OCR couldn't add any text, e.g. when ocrmypdf isn't installed
+        show_parse_error(file_name, err)
+        return None
+
+
 def handle_encrypted_document(document: PdfDocument) -> PdfDocument | None:
     passwords: list[str] = st.session_state.setdefault("pdf_passwords", [])
 
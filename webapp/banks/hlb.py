@@ -2,11 +2,19 @@
 
 import re
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-from webapp.fallback_parsers.pdf_text import (
-    TextItem,
-    extract_text_items_from_pdf,
-    group_text_items_into_rows,
+from webapp.fallback_parsers.pdf_text import PdfText, TextItem, contains_text
+
+if TYPE_CHECKING:
+    from monopoly.pdf import PdfDocument
+
+ACCOUNT_TYPE = "HLB PRIMEBIZ CURRENT ACCOUNT"
+STOP_PHRASES = (
+    "Rebate Summary",
+    "Closing Balance",
+    "Total Withdrawals",
+    "Total Deposits",
 )
 
 
@@ -18,71 +26,73 @@ class HongLeongBankParser:
         self._amount_re = re.compile(r"\b\d{1,3}(?:,\d{3})*\.\d{2}\b")
 
     @staticmethod
-    def is_hlb_statement(pdf_bytes: bytes) -> bool:
+    def is_hlb_document(document: "PdfDocument") -> bool:
+        """Cheaply check the first page of a document for the HLB PrimeBiz header."""
+        if not document.page_count:
+            return False
+
+        xrefs = document[0].get_contents()
+        streams = (stream for xref in xrefs if (stream := document.xref_stream(xref)))
+        return contains_text(streams, ACCOUNT_TYPE)
+
+    @staticmethod
+    def is_hlb_statement(text: PdfText) -> bool:
         """Check if this is an HLB PrimeBiz statement."""
-        items = extract_text_items_from_pdf(pdf_bytes)
-        return any("HLB PRIMEBIZ CURRENT ACCOUNT" in item.text for item in items)
+        return text.contains(ACCOUNT_TYPE)
 
-    def parse(self, pdf_bytes: bytes) -> list[dict]:
+    def parse(self, text: PdfText) -> list[dict]:
         """Parse HLB statement and return transactions as dicts."""
-        items = extract_text_items_from_pdf(pdf_bytes)
-        if not items:
+        if not text.pages:
             return []
 
         # Verify this is an HLB PrimeBiz statement
-        if not any("HLB PRIMEBIZ CURRENT ACCOUNT" in item.text for item in items):
-            return []
-
-        rows = group_text_items_into_rows(items)
-        header = self._find_transaction_header(rows)
-        if header is None:
+        if not self.is_hlb_statement(text):
             return []
 
-        header_y, anchors = header
-        desc_left = anchors["desc"] - 20.0
-        desc_right = anchors["deposit"] - 2.0
-
-        ordered_rows: list[tuple[float, list[TextItem]]] = [
-            (y, row_items) for y, row_items in rows.items() if y < header_y - 1.0
-        ]
-        ordered_rows.sort(key=lambda t: t[0], reverse=True)
-
-        stop_phrases = (
-            "Rebate Summary",
-            "Closing Balance",
-            "Total Withdrawals",
-            "Total Deposits",
-        )
-
         transactions: list[dict] = []
         current: dict | None = None
+        anchors: dict[str, float] | None = None
+        table_ended = False
 
-        for _, row_items in ordered_rows:
-            full_line = " ".join(t.text for t in row_items)
-            if any(p in full_line for p in stop_phrases):
+        for rows in text.page_rows.values():
+            if table_ended:
                 break
 
-            date = self._extract_row_date(row_items, desc_left)
-            desc = self._extract_description(
-                row_items=row_items, desc_left=desc_left, desc_right=desc_right
-            )
-            deposit, withdrawal = self._extract_amounts(row_items, anchors)
-
-            if date:
-                if current is not None:
-                    transactions.append(current)
-
-                current = {
-                    "date": date,
-                    "description": desc,
-                    "deposit": deposit,
-                    "withdrawal": withdrawal,
-                }
+            page_rows = self._get_transaction_rows(rows, anchors)
+            if page_rows is None:
                 continue
 
-            # Continuation lines for the previous transaction
-            if current is not None and desc:
-                current["description"] = (current["description"] + " " + desc).strip()
+            anchors, ordered_rows = page_rows
+            desc_left = anchors["desc"] - 20.0
+            desc_right = anchors["deposit"] - 2.0
+
+            for row_items in ordered_rows:
+                full_line = " ".join(t.text for t in row_items)
+                if any(p in full_line for p in STOP_PHRASES):
+                    table_ended = True
+                    break
+
+                date = self._extract_row_date(row_items, desc_left)
+                desc = self._extract_description(
+                    row_items=row_items, desc_left=desc_left, desc_right=desc_right
+                )
+                deposit, withdrawal = self._extract_amounts(row_items, anchors)
+
+                if date:
+                    if current is not None:
+                        transactions.append(current)
+
+                    current = {
+                        "date": date,
+                        "description": desc,
+                        "deposit": deposit,
+                        "withdrawal": withdrawal,
+                    }
+                    continue
+
+                # Continuation lines for the previous transaction
+                if current is not None and desc:
+                    current["description"] = (current["description"] + " " + desc).strip()
 
         if current is not None:
             transactions.append(current)
@@ -116,6 +126,37 @@ class HongLeongBankParser:
 
         return result
 
+    def _get_transaction_rows(
+        self, rows: dict[float, list[TextItem]], anchors: dict[str, float] | None
+    ) -> tuple[dict[str, float], list[list[TextItem]]] | None:
+        """
+        Return the column anchors and transaction rows of a single page.
+
+        Pages without a header continue the table from the previous page,
+        using its anchors. Since they still repeat the page header, their
+        table starts at the first row that looks like a transaction. Rows are
+        already ordered top-to-bottom.
+        """
+        header = self._find_transaction_header(rows)
+        if header is None:
+            if anchors is None:
+                return None
+            page_rows = list(rows.values())
+            start = next(
+                (i for i, row_items in enumerate(page_rows) if self._is_transaction_row(row_items, anchors)),
+                len(page_rows),
+            )
+            return anchors, page_rows[start:]
+
+        header_y, anchors = header
+        return anchors, [row_items for y, row_items in rows.items() if y < header_y - 1.0]
+
+    def _is_transaction_row(self, row_items: list[TextItem], anchors: dict[str, float]) -> bool:
+        """Check for a date in the date column, and an amount in the deposit or withdrawal column."""
+        if self._extract_row_date(row_items, anchors["desc"] - 20.0) is None:
+            return False
+        return any(self._extract_amounts(row_items, anchors))
+
     def _find_transaction_header(
         self, rows: dict[float, list[TextItem]]
     ) -> tuple[float, dict[str, float]] | None:
@@ -0,0 +1,172 @@
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from webapp.config import AppConfig
+from webapp.models import ProcessedFile
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of a pickled ProcessedFile changes
+CACHE_FORMAT_VERSION = 2
+
+
+def get_app_version() -> str:
+    """
+    Return the installed version of the app.
+
+    A source checkout that isn't installed has no version, so a hash of
+    its sources stands in for one, and any edit invalidates cached results.
+    """
+    try:
+        return version("statement_sensei")
+    except PackageNotFoundError:
+        package = Path(__file__).parent
+        digest = hashlib.sha256()
+        for path in sorted(package.rglob("*.py")):
+            digest.update(path.relative_to(package).as_posix().encode())
+            digest.update(path.read_bytes())
+        return f"source-{digest.hexdigest()}"
+
+
+@lru_cache(maxsize=1)
+def get_parser_identity() -> bytes:
+    """Versions of the parsing code, so that upgrades invalidate cached results."""
+    return (
+        f"monopoly-core=={version('monopoly-core')};"
+        f"statement-sensei=={get_app_version()};"
+        f"cache-format={CACHE_FORMAT_VERSION}"
+    ).encode()
+
+
+def get_cache_key(file_bytes: bytes | memoryview) -> str:
+    """Content-addressed key for a statement, independent of its file name."""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(get_parser_identity())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Stores files on local disk, keyed by a content hash.
+
+    Entries are evicted least-recently-used first once the cache grows
+    past `max_bytes`. Reads refresh an entry's modification time, which
+    is what eviction is ordered by.
+
+    The cache is best-effort: a directory that can't be read or written,
+    e.g. because it's read-only or full, is logged and treated as a miss.
+    """
+
+    suffix = ".bin"
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def read(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning("Couldn't read cache entry %s", path, exc_info=True)
+            return None
+
+        # unlike touch, this doesn't create an empty entry if another process evicted it meanwhile
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return data
+
+    def write(self, key: str, data: bytes) -> None:
+        try:
+            self._write(key, data)
+            self.evict()
+        except OSError:
+            logger.warning("Couldn't write cache entry %s to %s", key, self.directory, exc_info=True)
+
+    def _write(self, key: str, data: bytes) -> None:
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        # write to a temporary file first, so that concurrent sessions
+        # never read a partially written entry
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+            temp_path = Path(file.name)
+        try:
+            temp_path.write_bytes(data)
+            temp_path.replace(self._path(key))
+        except OSError:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    def discard(self, key: str) -> None:
+        with contextlib.suppress(OSError):
+            self._path(key).unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+
+class ParseCache(DiskCache):
+    """Stores parsed statements, keyed by `get_cache_key`."""
+
+    suffix = ".pkl"
+
+    def get(self, key: str) -> ProcessedFile | None:
+        data = self.read(key)
+        if data is None:
+            return None
+
+        try:
+            return pickle.loads(data)  # noqa: S301
+        # a corrupt entry can fail to unpickle with almost any error, not just UnpicklingError
+        except Exception:  # noqa: BLE001
+            logger.warning("Discarding unreadable cache entry %s", key, exc_info=True)
+            self.discard(key)
+            return None
+
+    def put(self, key: str, processed_file: ProcessedFile) -> None:
+        self.write(key, pickle.dumps(processed_file))
+
+
+class OcrPageCache(DiskCache):
+    """Stores single-page PDFs with an OCR text layer, keyed by a hash of the scanned page."""
+
+    suffix = ".pdf"
+
+
+def get_parse_cache() -> ParseCache | None:
+    config = AppConfig()
+    if not config.parse_cache_dir:
+        return None
+    return ParseCache(config.parse_cache_dir, config.parse_cache_max_bytes)
+
+
+def get_ocr_cache() -> OcrPageCache | None:
+    config = AppConfig()
+    if not config.ocr_cache_dir:
+        return None
+    return OcrPageCache(config.ocr_cache_dir, config.ocr_cache_max_bytes)
@@ -0,0 +1,286 @@
+"""
+Headless batch conversion of bank statements, without a Streamlit session.
+
+e.g. statement-sensei convert statements/ -o transactions.csv --workers 8
+"""
+
+import argparse
+import glob
+import json
+import logging
+import sys
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from monopoly.pdf import PdfPasswords
+from pydantic import SecretStr
+
+from webapp.config import AppConfig
+from webapp.export import EXPORT_FORMATS, to_arrow_table, write_tables
+from webapp.helpers import create_df, format_df
+from webapp.models import DiagnosticLevel, ProcessedFile
+from webapp.processing import get_executor, parse_file
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = {
+    DiagnosticLevel.INFO: logging.INFO,
+    DiagnosticLevel.WARNING: logging.WARNING,
+    DiagnosticLevel.ERROR: logging.ERROR,
+}
+
+
+class Manifest:
+    """
+    Append-only JSON lines record of the files handled by a conversion run.
+
+    Files recorded as converted are skipped when the run is repeated, so an
+    interrupted run can be resumed without duplicating rows in the output.
+    Each converted file also records the size of the output after its rows
+    were appended, which is where a resumed run carries on from.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.converted: set[str] = set()
+        self.output_bytes = 0
+
+        if not path.exists():
+            return
+
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line may have been cut off by an interrupted run
+                continue
+            if entry.get("status") == "ok":
+                self.converted.add(entry["file"])
+                self.output_bytes = entry["output_bytes"]
+
+    def record(self, file: str, status: str, **fields) -> None:
+        entry = {"file": file, "status": status, **fields}
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def find_statements(inputs: list[str]) -> list[Path]:
+    """Expand files, directories and glob patterns into a de-duplicated list of PDFs."""
+    paths: dict[Path, None] = {}
+    for pattern in inputs:
+        path = Path(pattern)
+        if path.is_file():
+            paths.setdefault(path.resolve(), None)
+            continue
+
+        # Path.glob doesn't take absolute patterns, e.g. /mnt/statements/*.pdf
+        matches = path.rglob("*") if path.is_dir() else map(Path, glob.glob(pattern, recursive=True))  # noqa: PTH207
+        for match in sorted(matches):
+            if match.is_file() and match.suffix.lower() == ".pdf":
+                paths.setdefault(match.resolve(), None)
+
+    return list(paths)
+
+
+def read_password_file(path: Path) -> list[SecretStr]:
+    """Read one password per line, ignoring blank lines."""
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [SecretStr(line.strip()) for line in lines if line.strip()]
+
+
+def convert_file(path: str, passwords: list[SecretStr]) -> ProcessedFile:
+    """Parse a statement from disk, reading it in the worker rather than the parent process."""
+    file_path = Path(path)
+    return parse_file(file_path.read_bytes(), file_path.name, passwords)
+
+
+def iter_results(
+    paths: list[Path], passwords: list[SecretStr], workers: int
+) -> Iterator[tuple[Path, ProcessedFile | Exception]]:
+    """
+    Parse statements and yield their results in input order.
+
+    Only a few files per worker are submitted ahead of the file being
+    yielded, so memory stays bounded on runs over thousands of statements.
+    """
+    executor = get_executor(workers)
+    if executor is None:
+        for path in paths:
+            try:
+                yield path, convert_file(str(path), passwords)
+            # any parser failure is reported against its file, rather than ending the run
+            except Exception as err:  # noqa: BLE001
+                yield path, err
+        return
+
+    pending: deque[tuple[Path, Future[ProcessedFile]]] = deque()
+    for path in paths:
+        pending.append((path, executor.submit(convert_file, str(path), passwords)))
+        if len(pending) >= workers * 2:
+            yield get_result(*pending.popleft())
+
+    while pending:
+        yield get_result(*pending.popleft())
+
+
+def get_result(path: Path, future: Future[ProcessedFile]) -> tuple[Path, ProcessedFile | Exception]:
+    try:
+        return path, future.result()
+    # any parser failure is reported against its file, rather than ending the run
+    except Exception as err:  # noqa: BLE001
+        return path, err
+
+
+# the keyword-only options mirror the convert command's flags
+def convert_statements(  # noqa: PLR0913
+    paths: list[Path],
+    output: Path,
+    *,
+    workers: int = 1,
+    passwords: list[SecretStr] | None = None,
+    manifest: Manifest | None = None,
+    output_format: str = "csv",
+) -> int:
+    """
+    Convert statements into a single file, and return the number of files that failed.
+
+    Without a manifest, the output is overwritten. With one, rows for newly
+    converted files are appended to the output of the previous run. CSV rows
+    are written as each file is converted, while Parquet and Arrow files are
+    written once every file has been converted.
+    """
+    prepare_output(output, manifest)
+    if manifest:
+        paths = skip_converted(paths, manifest)
+
+    passwords = PdfPasswords().pdf_passwords + (passwords or [])
+    failed = 0
+    tables: list[pa.Table] = []
+
+    for path, result in iter_results(paths, passwords, workers):
+        if isinstance(result, Exception):
+            logger.error("Couldn't parse %s: %s", path, result)
+            if manifest:
+                manifest.record(str(path), "error", error=str(result))
+            failed += 1
+            continue
+
+        if result.transactions and (table := write_transactions(result, output, output_format)) is not None:
+            tables.append(table)
+
+        for diagnostic in result.diagnostics:
+            logger.log(LOG_LEVELS[diagnostic.level], "%s: %s", path, diagnostic.message)
+
+        if manifest:
+            manifest.record(
+                str(path),
+                "ok",
+                transactions=len(result.transactions),
+                diagnostics=[diagnostic.kind.value for diagnostic in result.diagnostics],
+                output_bytes=output.stat().st_size if output.exists() else 0,
+            )
+        logger.info("Converted %s (%d transactions)", path, len(result.transactions))
+
+    if output_format != "csv":
+        write_tables(tables, str(output), output_format)
+    return failed
+
+
+def prepare_output(output: Path, manifest: Manifest | None) -> None:
+    """Clear the output for a new run, or cut it back to the last converted file for a resumed one."""
+    if manifest is None or not manifest.path.exists():
+        output.unlink(missing_ok=True)
+    else:
+        # rows appended after the last recorded file belong to a file whose
+        # conversion was interrupted, and which is converted again
+        truncate_output(output, manifest.output_bytes)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+
+def skip_converted(paths: list[Path], manifest: Manifest) -> list[Path]:
+    skipped = [path for path in paths if str(path) in manifest.converted]
+    if skipped:
+        logger.info("Skipping %d file(s) already converted", len(skipped))
+    return [path for path in paths if str(path) not in manifest.converted]
+
+
+def write_transactions(result: ProcessedFile, output: Path, output_format: str) -> "pa.Table | None":
+    """Append a file's rows to a CSV output, or return them as a table for the other formats."""
+    df = format_df(create_df([result]))
+    if output_format != "csv":
+        return to_arrow_table(df)
+
+    df.to_csv(output, mode="a", header=not output.exists(), index=False)
+    return None
+
+
+def truncate_output(output: Path, size: int) -> None:
+    """Cut an output back to `size` bytes, removing it if that leaves nothing, e.g. not even a header."""
+    if not output.exists() or output.stat().st_size <= size:
+        return
+    if size == 0:
+        output.unlink()
+        return
+    with output.open("r+b") as f:
+        f.truncate(size)
+
+
+def get_output_format(output: Path) -> str:
+    for name, export_format in EXPORT_FORMATS.items():
+        if output.suffix.lower() == export_format.extension:
+            return name
+    return "csv"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="statement-sensei", description="PDF to CSV conversion for bank statements")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="convert PDF statements into a single CSV file")
+    convert.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    convert.add_argument("-o", "--output", type=Path, required=True, help="file to write")
+    convert.add_argument(
+        "-f",
+        "--format",
+        choices=list(EXPORT_FORMATS),
+        help="output format, which defaults to the one matching the output's extension, or CSV",
+    )
+    convert.add_argument(
+        "-w", "--workers", type=int, default=AppConfig().parse_workers, help="number of parser processes"
+    )
+    convert.add_argument("--password-file", type=Path, help="file with one PDF password per line")
+    convert.add_argument("--manifest", type=Path, help="JSON lines file used to resume an interrupted run")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    output_format = args.format or get_output_format(args.output)
+    if args.manifest and output_format != "csv":
+        parser.error("--manifest can only resume CSV outputs")
+
+    paths = find_statements(args.inputs)
+    if not paths:
+        parser.error("no PDF files found")
+
+    failed = convert_statements(
+        paths,
+        args.output,
+        workers=args.workers,
+        passwords=read_password_file(args.password_file) if args.password_file else None,
+        manifest=Manifest(args.manifest) if args.manifest else None,
+        output_format=output_format,
+    )
+    if failed:
+        logger.error("Failed to convert %d of %d file(s)", failed, len(paths))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
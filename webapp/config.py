@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from pydantic_settings import BaseSettings
+
+
+class AppConfig(BaseSettings):
+    """
+    Runtime settings for the webapp, populated from environment variables.
+
+    e.g. export PARSE_WORKERS=8
+    """
+
+    # number of worker processes used to parse uploaded statements;
+    # a value of 1 parses files one at a time on the script thread
+    parse_workers: int = 1
+
+    # number of worker processes used to add an OCR layer to scanned
+    # statements in the background; each one runs Tesseract
+    ocr_workers: int = 1
+    # statements queued for or running OCR, across all sessions; each one
+    # holds a copy of its PDF in memory, so further ones are turned away
+    ocr_queue_size: int = 16
+
+    # directory used to persist parsed statements between sessions;
+    # disabled by default, since it writes transactions to disk
+    parse_cache_dir: Path | None = None
+    parse_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # directory used to persist OCR'd pages, so that scanned pages seen
+    # before skip Tesseract; disabled by default for the same reason
+    ocr_cache_dir: Path | None = None
+    ocr_cache_max_bytes: int = 512 * 1024 * 1024
+
+    # memory that the transactions kept by each session should stay
+    # under; larger frames are logged as a warning
+    session_memory_budget_bytes: int = 64 * 1024 * 1024
+
+    # conversion requests the HTTP API runs at once; further requests
+    # are rejected with a 503 until one of them finishes
+    api_max_concurrent_requests: int = 4
+    # seconds before a conversion request is abandoned with a 504
+    api_request_timeout: float = 120
@@ -0,0 +1,161 @@
+"""Bank detection, run once per document and carried over to its OCR'd copy."""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from monopoly.banks import BankDetector, banks
+from monopoly.generic import GenericBank
+from monopoly.identifiers import Identifier, MetadataIdentifier, TextIdentifier
+
+if TYPE_CHECKING:
+    from monopoly.banks import BankBase
+    from monopoly.pdf import PdfDocument
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionConfidence(str, Enum):
+    # matched on PDF metadata alone, which OCR doesn't change
+    METADATA = "metadata"
+    # matched on page text, so it depends on the text layer
+    TEXT = "text"
+    # no bank matched, and the generic parser is used
+    NONE = "none"
+
+
+@dataclass(frozen=True)
+class BankDetection:
+    bank: type["BankBase"]
+    confidence: DetectionConfidence
+    metadata: MetadataIdentifier
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """An identifier group of a bank, with the string used to look it up in the index."""
+
+    order: int
+    bank: type["BankBase"]
+    group: list[Identifier]
+    anchor: str
+    uses_text: bool
+
+
+class BankIndex:
+    """
+    Index of bank identifier groups, so that detection doesn't try every bank in turn.
+
+    Groups with a metadata identifier are indexed under their longest metadata
+    value. Since identifiers match substrings, a document's metadata is looked up
+    with windows of each indexed length, which costs the same however many banks
+    there are. Groups that only identify page text are kept aside in bank order,
+    and checked against their longest text before the full identifiers are.
+    """
+
+    def __init__(self, banks: list[type["BankBase"]]):
+        # field name -> anchor length -> anchor -> candidates
+        self.metadata_index: dict[str, dict[int, dict[str, list[Candidate]]]] = defaultdict(
+            lambda: defaultdict(lambda: defaultdict(list))
+        )
+        self.text_candidates: list[Candidate] = []
+
+        groups = ((bank_type, identifiers) for bank_type in banks for identifiers in bank_type.identifiers)
+        for order, (bank, group) in enumerate(groups):
+            uses_text = _uses_text(group)
+            metadata_values = [
+                (field.name, value)
+                for identifier in group
+                if isinstance(identifier, MetadataIdentifier)
+                for field in fields(identifier)
+                if (value := getattr(identifier, field.name))
+            ]
+            if metadata_values:
+                field_name, anchor = max(metadata_values, key=lambda item: len(item[1]))
+                candidate = Candidate(order, bank, group, anchor, uses_text)
+                self.metadata_index[field_name][len(anchor)][anchor].append(candidate)
+            elif group:
+                anchor = max((identifier.text for identifier in group), key=len)
+                self.text_candidates.append(Candidate(order, bank, group, anchor, uses_text))
+
+    def metadata_candidates(self, metadata: MetadataIdentifier) -> list[Candidate]:
+        """Find the groups whose anchor appears in the document metadata, in bank order."""
+        candidates: list[Candidate] = []
+        for field_name, anchors_by_length in self.metadata_index.items():
+            value = getattr(metadata, field_name) or ""
+            for length, anchors in anchors_by_length.items():
+                seen = {value[start : start + length] for start in range(len(value) - length + 1)}
+                for anchor in seen & anchors.keys():
+                    candidates.extend(anchors[anchor])
+        return sorted(candidates, key=lambda candidate: candidate.order)
+
+
+@lru_cache(maxsize=1)
+def get_bank_index() -> BankIndex:
+    return BankIndex(banks)
+
+
+def detect_bank(document: "PdfDocument") -> BankDetection:
+    """Detect the bank of a document, reusing the result of any earlier detection."""
+    detection: BankDetection | None = getattr(document, "_bank_detection", None)
+    if detection is None:
+        detection = _detect_bank(document, text_only=False) or _no_detection(document)
+        document._bank_detection = detection
+    return detection
+
+
+def detect_bank_after_ocr(document: "PdfDocument", previous: BankDetection) -> BankDetection:
+    """
+    Detect the bank of an OCR'd copy of a document that was already detected.
+
+    OCR keeps the document metadata, so a metadata match still holds. Otherwise,
+    only identifiers that look at page text can match now that there is a text layer.
+    """
+    detection = previous
+    if previous.confidence != DetectionConfidence.METADATA:
+        detection = _detect_bank(document, text_only=True) or previous
+
+    document._bank_detection = detection
+    return detection
+
+
+def _detect_bank(document: "PdfDocument", *, text_only: bool) -> BankDetection | None:
+    """
+    Find the first bank whose identifiers fully match, using the index to pick candidates.
+
+    The first matching candidate found through the metadata is only returned if
+    no group that only identifies page text comes before it in monopoly's bank
+    order, so that the same bank is detected as with a linear scan.
+    """
+    index = get_bank_index()
+    detector = BankDetector(document)
+    candidates = index.metadata_candidates(detector.metadata_identifier)
+    if text_only:
+        candidates = [candidate for candidate in candidates if candidate.uses_text]
+
+    match = next((candidate for candidate in candidates if detector.identifiers_match(candidate.group)), None)
+
+    for candidate in index.text_candidates:
+        if match is not None and candidate.order > match.order:
+            break
+        if candidate.anchor in (document.raw_text or "") and detector.identifiers_match(candidate.group):
+            return _found(candidate, detector)
+
+    return _found(match, detector) if match else None
+
+
+def _found(candidate: Candidate, detector: BankDetector) -> BankDetection:
+    logger.debug("Identified statement bank: %s", candidate.bank.__name__)
+    confidence = DetectionConfidence.TEXT if candidate.uses_text else DetectionConfidence.METADATA
+    return BankDetection(candidate.bank, confidence, detector.metadata_identifier)
+
+
+def _no_detection(document: "PdfDocument") -> BankDetection:
+    return BankDetection(GenericBank, DetectionConfidence.NONE, document.metadata_identifier)
+
+
+def _uses_text(group: list[Identifier]) -> bool:
+    return any(isinstance(identifier, TextIdentifier) for identifier in group)
@@ -0,0 +1,94 @@
+"""Exports of the transactions frame, as CSV or as typed columnar files."""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# rows serialised at a time when exporting, which bounds the size of each chunk
+CSV_CHUNK_ROWS = 10_000
+
+# columnar exports carry their types, so that they load without re-inferring
+# dates and amounts; repeated descriptions and banks are dictionary-encoded
+TRANSACTIONS_SCHEMA = pa.schema(
+    [
+        pa.field("Date", pa.date32()),
+        pa.field("Description", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("Amount", pa.float64()),
+        pa.field("Bank", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+    """Serialise a frame as CSV a chunk of rows at a time, starting with the header."""
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start : start + chunk_rows].to_csv(index=False, header=False).encode("utf-8")
+
+
+def export_csv(df: pd.DataFrame) -> bytes:
+    """
+    Export a frame as CSV bytes.
+
+    Chunking only bounds the intermediate text that pandas builds for each
+    chunk. The finished export is still held in memory in full, since
+    Streamlit's download button reads any file it's given into memory.
+    """
+    return b"".join(iter_csv_chunks(df))
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Convert a frame from `format_df` into an Arrow table with the transactions schema."""
+    return pa.Table.from_pandas(df, schema=TRANSACTIONS_SCHEMA, preserve_index=False)
+
+
+def write_parquet(table: pa.Table, sink) -> None:
+    pq.write_table(table, sink, compression="zstd")
+
+
+def write_arrow(table: pa.Table, sink) -> None:
+    # the Arrow IPC file format, which is also what Feather v2 files use
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def write_tables(tables: list[pa.Table], sink, output_format: str) -> None:
+    """Write tables, e.g. one per statement, into a single Parquet or Arrow file."""
+    if tables:
+        table = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+    else:
+        table = TRANSACTIONS_SCHEMA.empty_table()
+    COLUMNAR_WRITERS[output_format](table, sink)
+
+
+def export_parquet(df: pd.DataFrame) -> bytes:
+    sink = pa.BufferOutputStream()
+    write_parquet(to_arrow_table(df), sink)
+    return sink.getvalue().to_pybytes()
+
+
+def export_arrow(df: pd.DataFrame) -> bytes:
+    sink = pa.BufferOutputStream()
+    write_arrow(to_arrow_table(df), sink)
+    return sink.getvalue().to_pybytes()
+
+
+COLUMNAR_WRITERS = {"parquet": write_parquet, "arrow": write_arrow}
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    label: str
+    extension: str
+    mime: str
+    export: Callable[[pd.DataFrame], bytes]
+
+
+EXPORT_FORMATS = {
+    "csv": ExportFormat("CSV", ".csv", "text/csv", export_csv),
+    "parquet": ExportFormat("Parquet", ".parquet", "application/vnd.apache.parquet", export_parquet),
+    "arrow": ExportFormat("Arrow", ".arrow", "application/vnd.apache.arrow.file", export_arrow),
+}
@@ -1,19 +1,87 @@
 import re
 import zlib
-from collections import defaultdict
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
+from functools import cached_property
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TextItem:
     x: float
     y: float
     text: str
 
 
+@dataclass
+class PdfText:
+    """
+    Text extracted from a PDF once, and shared by bank detection and parsing.
+
+    Items are kept per page, keyed by page index, since coordinates are only
+    comparable between items on the same page.
+    """
+
+    pages: dict[int, list[TextItem]]
+
+    @property
+    def items(self) -> list[TextItem]:
+        return [item for page_items in self.pages.values() for item in page_items]
+
+    @cached_property
+    def page_rows(self) -> dict[int, dict[float, list[TextItem]]]:
+        return {page: group_text_items_into_rows(page_items) for page, page_items in self.pages.items()}
+
+    def contains(self, text: str) -> bool:
+        return any(text in item.text for page_items in self.pages.values() for item in page_items)
+
+
 _NUM_TOKEN_RE = re.compile(
     br"^[+-]?(?:\d+\.\d*|\d*\.\d+|\d+)(?:[eE][+-]?\d+)?$"
 )
+_ENDSTREAM_RE = re.compile(br"endstream")
+
+# one token per match, including any whitespace before it; strings and
+# arrays that nest, or that are not terminated, fail to match here and
+# are scanned by `_scan_nested_token`
+_TOKEN_RE = re.compile(
+    br"""
+    [ \t\r\n\x0c\x00]*
+    (?:
+        (?P<comment>%[^\n]*\n)
+        | \((?P<str>(?:[^()\\]|\\.)*)\)
+        | \[(?P<arr>(?:[^\[\]\\]|\\.)*)\]
+        | (?P<name>/[^ \t\r\n\x0c\x00()\[\]<>{}/%]*)
+        | (?P<tok>[^ \t\r\n\x0c\x00()\[\]<>{}/%]+)
+        | (?P<delim>[)\]<>{}])
+    )
+    | (?P<space>[ \t\r\n\x0c\x00]+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# patterns used to walk the object structure of a PDF
+_OBJ_HEADER_RE = re.compile(br"(\d+)\s+\d+\s+obj\b")
+_OBJ_END_RE = re.compile(br"(?<![A-Za-z])stream\r?\n|endobj")
+_STREAM_END_RE = re.compile(br"\s*endstream")
+_LENGTH_RE = re.compile(br"/Length\s+(\d+)(\s+\d+\s+R)?")
+_FILTER_RE = re.compile(br"/Filter\s*(\[[^\]]*\]|/[^\s/\[\]<>()]+)")
+_FILTER_NAME_RE = re.compile(br"/([^\s/\[\]<>()]+)")
+_REF_RE = re.compile(br"(\d+)\s+\d+\s+R")
+_CATALOG_RE = re.compile(br"/Type\s*/Catalog(?![A-Za-z])")
+_PAGES_RE = re.compile(br"/Pages\s+(\d+)\s+\d+\s+R")
+_PAGE_RE = re.compile(br"/Type\s*/Page(?![A-Za-z])")
+_KIDS_RE = re.compile(br"/Kids\s*\[([^\]]*)\]")
+_CONTENTS_RE = re.compile(br"/Contents\s*(\[[^\]]*\]|\d+\s+\d+\s+R)")
+_OBJSTM_RE = re.compile(br"/Type\s*/ObjStm(?![A-Za-z])")
+_FIRST_RE = re.compile(br"/First\s+(\d+)")
+_FLATE_FILTERS = (b"FlateDecode", b"Fl")
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class _PdfObject:
+    body: bytes
+    stream: memoryview | None = None
 
 
 def _decode_pdf_literal(raw: bytes) -> str:
@@ -65,93 +133,147 @@ def _decode_pdf_literal(raw: bytes) -> str:
 
 
 def _tokenize_pdf_content_stream(data: bytes):
-    i = 0
-    whitespace = b" \t\r\n\x0c\x00"
-    while i < len(data):
-        c = data[i]
-        if c in whitespace:
-            i += 1
+    for kind, val, _ in _scan_tokens(data, final=True):
+        yield (kind, val)
+
+
+def _tokenize_pdf_content_stream_chunks(chunks: Iterable[bytes]):
+    """
+    Tokenize a content stream that is decoded incrementally, one chunk at a time.
+
+    A token that is still open at the end of the buffer is carried over, and
+    only rescanned once at least as many new bytes have arrived, so that long
+    or unterminated tokens (e.g. inline image data) are rescanned a logarithmic
+    number of times rather than once per chunk.
+    """
+    buf = b""
+    pending: list[bytes] = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size < len(buf):
             continue
-        if c == 0x25:  # % comment
-            j = data.find(b"\n", i)
-            if j == -1:
+
+        buf = b"".join([buf, *pending])
+        pending.clear()
+        pending_size = 0
+        pos = 0
+        for kind, val, pos in _scan_tokens(buf, final=False):  # noqa: B007
+            yield (kind, val)
+        # carry over any token that may continue in the next chunk
+        buf = buf[pos:]
+
+    yield from _tokenize_pdf_content_stream(b"".join([buf, *pending]))
+
+
+def _scan_tokens(data: bytes, *, final: bool):
+    """
+    Yield (kind, value, end offset) for each token in `data`.
+
+    Unless `final` is set, scanning stops before a token that reaches the
+    end of `data`, since it may continue in the next chunk of the stream.
+    """
+    i = 0
+    end = len(data)
+    while i < end:
+        # the scanner matches back-to-back tokens until one needs the slow path
+        scanner = _TOKEN_RE.scanner(data, i)
+        for m in iter(scanner.match, None):
+            kind = m.lastgroup
+            i = m.end()
+            if kind in ("tok", "name"):
+                if i == end and not final:
+                    return
+                yield (kind, m.group(kind), i)
+            elif kind in ("str", "arr"):
+                yield (kind, m.group(kind), i)
+            elif kind == "delim":
+                yield ("tok", m.group(kind), i)
+
+        if i < end:
+            token = _scan_nested_token(data, i, final=final)
+            if token is None:
                 return
-            i = j + 1
-            continue
-        if c == 0x28:  # literal string
-            depth = 1
-            i += 1
-            buf = bytearray()
-            while i < len(data) and depth > 0:
-                ch = data[i]
-                if ch == 0x5C:  # escape
-                    buf.append(ch)
-                    i += 1
-                    if i < len(data):
-                        buf.append(data[i])
-                        i += 1
-                    continue
-                if ch == 0x28:
-                    depth += 1
-                elif ch == 0x29:
-                    depth -= 1
-                    if depth == 0:
-                        i += 1
-                        break
-                buf.append(ch)
-                i += 1
-            yield ("str", bytes(buf))
-            continue
-        if c == 0x5B:  # array
-            depth = 1
-            i += 1
-            buf = bytearray()
-            while i < len(data) and depth > 0:
-                ch = data[i]
-                if ch == 0x5C:
-                    buf.append(ch)
-                    i += 1
-                    if i < len(data):
-                        buf.append(data[i])
-                        i += 1
-                    continue
-                if ch == 0x5B:
-                    depth += 1
-                elif ch == 0x5D:
-                    depth -= 1
-                    if depth == 0:
-                        i += 1
-                        break
-                buf.append(ch)
-                i += 1
-            yield ("arr", bytes(buf))
-            continue
-        if c == 0x2F:  # name
-            j = i + 1
-            while j < len(data) and data[j] not in whitespace:
-                if data[j] in b"()[]<>{}/%":
-                    break
+            yield token
+            i = token[2]
+
+
+def _scan_nested_token(data: bytes, i: int, *, final: bool) -> tuple[str, bytes, int] | None:
+    """
+    Scan the token at `i` byte by byte, for tokens that `_TOKEN_RE` cannot match.
+
+    These are strings with nested parentheses, arrays with nested brackets,
+    unterminated strings and arrays, and a comment with no newline, which
+    ends the stream.
+    """
+    c = data[i]
+    if c == 0x25:  # % comment
+        return None
+
+    kind, open_char, close_char = ("str", 0x28, 0x29) if c == 0x28 else ("arr", 0x5B, 0x5D)
+    depth = 1
+    j = i + 1
+    buf = bytearray()
+    while j < len(data) and depth > 0:
+        ch = data[j]
+        if ch == 0x5C:  # escape
+            buf.append(ch)
+            j += 1
+            if j < len(data):
+                buf.append(data[j])
                 j += 1
-            yield ("name", data[i:j])
-            i = j
+            elif not final:
+                return None
             continue
-
-        j = i
-        while j < len(data) and data[j] not in whitespace:
-            if data[j] in b"()[]<>{}/%":
+        if ch == open_char:
+            depth += 1
+        elif ch == close_char:
+            depth -= 1
+            if depth == 0:
+                j += 1
                 break
-            j += 1
-        yield ("tok", data[i:j])
-        i = j
+        buf.append(ch)
+        j += 1
+    if depth > 0 and not final:
+        return None
+    return (kind, bytes(buf), j)
+
+
+def extract_text(pdf_bytes: bytes | memoryview) -> PdfText:
+    """
+    Extract text items page by page, as content streams are inflated.
+
+    Streams are decoded and tokenized in bounded chunks, and no decoded
+    stream is kept alive once its text items have been collected.
+    """
+    pages: dict[int, list[TextItem]] = {}
+    for page, chunks in _iter_content_streams(pdf_bytes):
+        page_items = pages.setdefault(page, [])
+        page_items.extend(_iter_text_items(_tokenize_pdf_content_stream_chunks(chunks)))
+    return PdfText(pages)
+
+
+def contains_text(streams: Iterable[bytes], text: str) -> bool:
+    """
+    Check whether any of the decoded content streams shows `text`.
+
+    Streams that do not contain the raw bytes of `text` are skipped without
+    being tokenized, unless they escape characters in their strings, which
+    could spell `text` differently. The search stops at the first match.
+    """
+    needle = text.encode("latin1")
+    for stream in streams:
+        if needle not in stream and b"\\" not in stream:
+            continue
+        tokens = _tokenize_pdf_content_stream(stream)
+        if any(text in item.text for item in _iter_text_items(tokens)):
+            return True
+    return False
 
 
-def extract_text_items_from_pdf(pdf_bytes: bytes) -> list[TextItem]:
-    items: list[TextItem] = []
-    for stream in _extract_flate_streams(pdf_bytes):
-        if b"BT" not in stream:
-            continue
-        items.extend(_extract_text_items_from_content_stream(stream))
-    return items
+def extract_text_items_from_pdf(pdf_bytes: bytes | memoryview) -> list[TextItem]:
+    return extract_text(pdf_bytes).items
 
 
 def group_text_items_into_rows(
@@ -159,50 +281,226 @@ def group_text_items_into_rows(
     *,
     y_tolerance: float = 1.8,
 ) -> dict[float, list[TextItem]]:
-    rows: dict[float, list[TextItem]] = defaultdict(list)
-    row_ys: list[float] = []
-
+    rows: dict[float, list[TextItem]] = {}
+    unordered_rows: list[list[TextItem]] = []
+    row: list[TextItem] = []
+    row_y = 0.0
+
+    # Items are visited top-to-bottom and a new row only starts more than
+    # `y_tolerance` below the previous one, so an item can only ever belong
+    # to the most recent row
     for item in sorted(items, key=lambda t: (-t.y, t.x)):
-        key: float | None = None
-        for ky in row_ys:
-            if abs(ky - item.y) <= y_tolerance:
-                key = ky
-                break
-
-        if key is None:
-            row_ys.append(item.y)
-            key = item.y
-
-        rows[key].append(item)
+        if not row or row_y - item.y > y_tolerance:
+            row_y = item.y
+            row = rows[row_y] = []
+        elif item.x < row[-1].x:
+            unordered_rows.append(row)
+        row.append(item)
 
     # Keep items within each row ordered left-to-right
-    return {y: sorted(row_items, key=lambda t: t.x) for y, row_items in rows.items()}
+    for row_items in unordered_rows:
+        row_items.sort(key=lambda t: t.x)
+    return rows
 
 
-def _extract_flate_streams(pdf_bytes: bytes) -> list[bytes]:
-    streams: list[bytes] = []
+def _iter_flate_streams(pdf_bytes: memoryview) -> Iterator[bytes]:
     for m in re.finditer(br"stream\r?\n", pdf_bytes):
         start = m.end()
-        end = pdf_bytes.find(br"endstream", start)
-        if end == -1:
+        end_match = _ENDSTREAM_RE.search(pdf_bytes, start)
+        if end_match is None:
             continue
-        raw = pdf_bytes[start:end]
+        raw = pdf_bytes[start : end_match.start()]
         try:
-            streams.append(zlib.decompress(raw))
+            yield zlib.decompress(raw)
         except Exception:
             continue
-    return streams
 
 
-def _extract_text_items_from_content_stream(stream: bytes) -> list[TextItem]:
-    items: list[TextItem] = []
+def _iter_content_streams(pdf_bytes: bytes | memoryview) -> Iterator[tuple[int, Iterator[bytes]]]:
+    """
+    Yield (page index, decoded chunks) for each page content stream, in page order.
+
+    Only streams referenced by a page's /Contents are inflated, so images,
+    fonts and other embedded files are skipped. Documents whose page tree
+    cannot be resolved fall back to inflating every Flate stream.
+    """
+    # slicing a memoryview is zero-copy, so streams are inflated in place
+    pdf_bytes = memoryview(pdf_bytes)
+    objects = _scan_objects(pdf_bytes)
+    pages = _find_pages(objects)
+    if not pages:
+        for stream in _iter_flate_streams(pdf_bytes):
+            if b"BT" in stream:
+                yield 0, iter((stream,))
+        return
+
+    for page_index, page in enumerate(pages):
+        for obj_num in _content_refs(page, objects):
+            obj = objects.get(obj_num)
+            if obj is not None and _can_decode(obj):
+                yield page_index, _iter_decoded_chunks(obj)
+
+
+def _scan_objects(pdf_bytes: memoryview) -> dict[int, _PdfObject]:
+    """
+    Index the indirect objects of a PDF by object number.
+
+    Stream data is skipped using its /Length, so binary data is never
+    searched for object headers. Later definitions of an object replace
+    earlier ones, as they do in incrementally updated files.
+    """
+    objects: dict[int, _PdfObject] = {}
+    pos = 0
+    while header := _OBJ_HEADER_RE.search(pdf_bytes, pos):
+        end = _OBJ_END_RE.search(pdf_bytes, header.end())
+        if end is None:
+            break
+
+        obj = _PdfObject(bytes(pdf_bytes[header.end() : end.start()]))
+        objects[int(header.group(1))] = obj
+        pos = end.end()
+        if end.group() == b"endobj":
+            continue
+
+        stream_end = _find_stream_end(pdf_bytes, pos, obj.body, objects)
+        if stream_end is None:
+            break
+        obj.stream = pdf_bytes[pos:stream_end]
+        pos = stream_end
+
+    _expand_object_streams(objects)
+    return objects
+
+
+def _find_stream_end(
+    pdf_bytes: memoryview, start: int, body: bytes, objects: dict[int, _PdfObject]
+) -> int | None:
+    if length_match := _LENGTH_RE.search(body):
+        length: int | None = int(length_match.group(1))
+        if length_match.group(2):
+            # indirect length, which can only be resolved if it was defined earlier
+            length_obj = objects.get(length)
+            length = int(length_obj.body) if length_obj and length_obj.body.strip().isdigit() else None
+
+        if length is not None and _STREAM_END_RE.match(pdf_bytes, start + length):
+            return start + length
+
+    # missing or incorrect /Length
+    end_match = _ENDSTREAM_RE.search(pdf_bytes, start)
+    return end_match.start() if end_match else None
+
+
+def _expand_object_streams(objects: dict[int, _PdfObject]) -> None:
+    """Add objects stored inside compressed object streams (/Type /ObjStm)."""
+    for obj in list(objects.values()):
+        if obj.stream is None or not _OBJSTM_RE.search(obj.body):
+            continue
+
+        first_match = _FIRST_RE.search(obj.body)
+        data = _decode_stream(obj)
+        if first_match is None or data is None:
+            continue
+
+        first = int(first_match.group(1))
+        header = data[:first].split()
+        offsets = [(int(num), first + int(offset)) for num, offset in zip(header[::2], header[1::2], strict=False)]
+        for i, (obj_num, start) in enumerate(offsets):
+            end = offsets[i + 1][1] if i + 1 < len(offsets) else len(data)
+            objects.setdefault(obj_num, _PdfObject(data[start:end]))
+
+
+def _stream_filters(obj: _PdfObject) -> list[bytes]:
+    filter_match = _FILTER_RE.search(obj.body)
+    return _FILTER_NAME_RE.findall(filter_match.group(1)) if filter_match else []
+
+
+def _can_decode(obj: _PdfObject) -> bool:
+    """Only unfiltered and Flate-encoded streams are supported."""
+    if obj.stream is None:
+        return False
+    filters = _stream_filters(obj)
+    return not filters or (len(filters) == 1 and filters[0] in _FLATE_FILTERS)
+
+
+def _decode_stream(obj: _PdfObject) -> bytes | None:
+    if not _can_decode(obj):
+        return None
+    return b"".join(_iter_decoded_chunks(obj))
+
+
+def _iter_decoded_chunks(obj: _PdfObject) -> Iterator[bytes]:
+    """Decode a stream in chunks of at most `_STREAM_CHUNK_SIZE` bytes."""
+    stream = obj.stream
+    if stream is None:
+        return
+
+    if not _stream_filters(obj):
+        for start in range(0, len(stream), _STREAM_CHUNK_SIZE):
+            yield bytes(stream[start : start + _STREAM_CHUNK_SIZE])
+        return
+
+    # input is fed in slices, since zlib copies the unconsumed input on every call
+    decompressor = zlib.decompressobj()
+    try:
+        for start in range(0, len(stream), _STREAM_CHUNK_SIZE):
+            data = stream[start : start + _STREAM_CHUNK_SIZE]
+            while data and not decompressor.eof:
+                if chunk := decompressor.decompress(data, _STREAM_CHUNK_SIZE):
+                    yield chunk
+                data = decompressor.unconsumed_tail
+            if decompressor.eof:
+                return
+        if chunk := decompressor.flush():
+            yield chunk
+    except zlib.error:
+        return
+
+
+def _find_pages(objects: dict[int, _PdfObject]) -> list[_PdfObject]:
+    """Walk the page tree from the document catalog, returning pages in order."""
+    catalog = next((obj for obj in objects.values() if _CATALOG_RE.search(obj.body)), None)
+    if catalog is None or (pages_match := _PAGES_RE.search(catalog.body)) is None:
+        return []
+
+    pages: list[_PdfObject] = []
+    seen: set[int] = set()
+    stack = [int(pages_match.group(1))]
+    while stack:
+        obj_num = stack.pop()
+        if obj_num in seen or (obj := objects.get(obj_num)) is None:
+            continue
+        seen.add(obj_num)
+
+        if kids := _KIDS_RE.search(obj.body):
+            stack.extend(reversed([int(ref) for ref in _REF_RE.findall(kids.group(1))]))
+        elif _PAGE_RE.search(obj.body):
+            pages.append(obj)
+    return pages
+
+
+def _content_refs(page: _PdfObject, objects: dict[int, _PdfObject]) -> list[int]:
+    if (contents := _CONTENTS_RE.search(page.body)) is None:
+        return []
+
+    refs = [int(ref) for ref in _REF_RE.findall(contents.group(1))]
+    if contents.group(1).startswith(b"[") or len(refs) != 1:
+        return refs
+
+    # /Contents can also be a reference to an array of content streams
+    obj = objects.get(refs[0])
+    if obj is not None and obj.stream is None and obj.body.strip().startswith(b"["):
+        return [int(ref) for ref in _REF_RE.findall(obj.body)]
+    return refs
+
+
+def _iter_text_items(tokens: Iterable[tuple[str, bytes]]) -> Iterator[TextItem]:
     stack: list[object] = []
 
     in_text = False
     x = 0.0
     y = 0.0
 
-    for kind, val in _tokenize_pdf_content_stream(stream):
+    for kind, val in tokens:
         if kind != "tok":
             stack.append((kind, val))
             continue
@@ -240,7 +538,7 @@ def _extract_text_items_from_content_stream(stream: bytes) -> list[TextItem]:
             if stack and isinstance(stack[-1], tuple) and stack[-1][0] == "str":
                 text = _decode_pdf_literal(stack[-1][1]).strip()
                 if text:
-                    items.append(TextItem(x=x, y=y, text=text))
+                    yield TextItem(x=x, y=y, text=text)
             stack.clear()
             continue
 
@@ -250,11 +548,9 @@ def _extract_text_items_from_content_stream(stream: bytes) -> list[TextItem]:
                 for sm in re.finditer(br"\((.*?)\)", arr_raw):
                     text = _decode_pdf_literal(sm.group(1)).strip()
                     if text:
-                        items.append(TextItem(x=x, y=y, text=text))
+                        yield TextItem(x=x, y=y, text=text)
             stack.clear()
             continue
 
         stack.clear()
 
-    return items
-
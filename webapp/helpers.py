@@ -1,56 +1,89 @@
 # pylint: disable=unsubscriptable-object
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
 
 import pandas as pd
 import streamlit as st
-from monopoly.banks import BankDetector, banks
-from monopoly.generic import GenericBank
 from monopoly.pdf import MissingOCRError, PdfDocument, PdfParser
 from monopoly.pipeline import Pipeline
 from monopoly.statements.base import SafetyCheckError
 from pydantic import SecretStr
 
 from webapp.banks import HongLeongBankParser
-from webapp.models import ProcessedFile, TransactionMetadata
+from webapp.detection import detect_bank, detect_bank_after_ocr
+from webapp.export import EXPORT_FORMATS
+from webapp.fallback_parsers.pdf_text import extract_text
+from webapp.models import Diagnostic, DiagnosticKind, DiagnosticLevel, ProcessedFile, TransactionMetadata
+from webapp.ocr import ocr_document
+
+logger = logging.getLogger(__name__)
+
+
+def get_document_bytes(document: PdfDocument) -> bytes | memoryview:
+    """Return the buffer that a document was opened from, without re-serialising it."""
+    if isinstance(document.file_bytes, BytesIO):
+        return document.file_bytes.getbuffer()
+    if document.file_bytes is not None:
+        return document.file_bytes
+    if document.file_path:
+        return Path(document.file_path).read_bytes()
+    return document.write()
 
 
 def build_pipeline(document: PdfDocument, password: str | None = None) -> tuple[Pipeline, PdfParser]:
-    analyzer = BankDetector(document)
-    bank = analyzer.detect_bank(banks) or GenericBank
+    bank = detect_bank(document).bank
     parser = PdfParser(bank, document)
     passwords = [SecretStr(password)] if password else []
     pipeline = Pipeline(parser, passwords=passwords)
     return pipeline, parser
 
 
-def parse_bank_statement(document: PdfDocument, password: str | None = None) -> ProcessedFile:
+def parse_bank_statement(
+    document: PdfDocument, password: str | None = None, *, apply_ocr: bool = True
+) -> ProcessedFile:
+    """
+    Parse a statement, adding an OCR layer first if it has no text.
+
+    With `apply_ocr=False`, MissingOCRError is raised instead, so that
+    callers can run the (slow) OCR step elsewhere.
+    """
     # Check if this is an HLB statement first (needs custom handling)
-    # Extract file_bytes from the document for HLB parser
+    # The first page is fingerprinted before paying for a full text extraction
     try:
-        file_bytes = document.write()
-        if HongLeongBankParser.is_hlb_statement(file_bytes):
+        if HongLeongBankParser.is_hlb_document(document):
+            text = extract_text(get_document_bytes(document))
             hlb_parser = HongLeongBankParser()
-            transactions = hlb_parser.parse(file_bytes)
+            transactions = hlb_parser.parse(text)
             if transactions:
                 metadata = TransactionMetadata("HongLeongBank")
                 return ProcessedFile(transactions, metadata)
     except Exception:
         pass  # Fall through to standard parsing
 
+    diagnostics: list[Diagnostic] = []
     try:
         pipeline, parser = build_pipeline(document, password)
     except MissingOCRError:
-        st.info(f"No text found - {document.name}. Attempting to apply OCR.")
-        with st.spinner(f"Adding OCR layer for {document.name}"):
-            analyzer = BankDetector(document)
-            bank = analyzer.detect_bank(banks) or GenericBank
-            # certain PDFs have strange formats that can break the OCR,
-            # so they need to be cropped before further processing
-            if cropbox := bank.pdf_config.page_bbox:
-                for page in document:
-                    page.set_cropbox(cropbox)
-
-            document = PdfParser.apply_ocr(document)
-            pipeline, parser = build_pipeline(document, password)
+        if not apply_ocr:
+            raise
+
+        logger.info("No text found in %s, applying OCR", document.name)
+        detection = detect_bank(document)
+        ocr_pdf = ocr_document(document, detection.bank.pdf_config.page_bbox)
+        if ocr_pdf is not document:
+            detect_bank_after_ocr(ocr_pdf, detection)
+        document = ocr_pdf
+        pipeline, parser = build_pipeline(document, password)
+        diagnostics.append(
+            Diagnostic(
+                DiagnosticKind.OCR_APPLIED,
+                DiagnosticLevel.INFO,
+                f"No text found - {document.name}. An OCR layer was added.",
+            )
+        )
 
     # skip initial safety check, and handle it outside the pipeline
     # so that we can raise a warning and still show transactions
@@ -61,54 +94,172 @@ def parse_bank_statement(document: PdfDocument, password: str | None = None) ->
         try:
             statement.perform_safety_check()
         except SafetyCheckError:
-            st.error(
-                f"Safety check failed for {document.name}, transactions are incorrect or missing",
-                icon="❗",
+            diagnostics.append(
+                Diagnostic(
+                    DiagnosticKind.SAFETY_CHECK_FAILED,
+                    DiagnosticLevel.ERROR,
+                    f"Safety check failed for {document.name}, transactions are incorrect or missing",
+                )
             )
     if not statement.config.safety_check:
-        st.warning(
-            f"{bank_name} {statement.config.statement_type} statements have no safety check, "
-            "please review your transactions and proceed with caution",
-            icon="⚠️",
+        diagnostics.append(
+            Diagnostic(
+                DiagnosticKind.NO_SAFETY_CHECK,
+                DiagnosticLevel.WARNING,
+                f"{bank_name} {statement.config.statement_type} statements have no safety check, "
+                "please review your transactions and proceed with caution",
+            )
         )
 
     if bank_name == "GenericBank":
-        st.warning("Unrecognized bank - using generic parser", icon="⚠️")
+        diagnostics.append(
+            Diagnostic(
+                DiagnosticKind.GENERIC_BANK,
+                DiagnosticLevel.WARNING,
+                "Unrecognized bank - using generic parser",
+            )
+        )
 
     metadata = TransactionMetadata(bank_name)
-    return ProcessedFile(pipeline.transform(statement), metadata)
+    return ProcessedFile(pipeline.transform(statement), metadata, diagnostics)
 
 
 def create_df(processed_files: list[ProcessedFile]) -> pd.DataFrame:
-    dataframes = []
+    """
+    Build one transactions frame for all files.
+
+    Columns are collected across every file in a single pass and typed once:
+    datetime64 dates, Arrow-backed descriptions, float64 amounts and a
+    categorical bank, which is a fraction of the memory of Python objects.
+    """
+    dates: list[str] = []
+    descriptions: list[str] = []
+    amounts: list[float] = []
+    bank_codes: list[int] = []
+    bank_names: dict[str, int] = {}
+
     for file in processed_files:
-        df = pd.DataFrame(file)
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df["bank"] = file.metadata.bank_name
+        code = bank_names.setdefault(file.metadata.bank_name, len(bank_names))
+        for transaction in file.transactions:
+            # the HLB parser returns plain dicts rather than monopoly transactions
+            values = transaction if isinstance(transaction, dict) else vars(transaction)
+            dates.append(values["date"])
+            descriptions.append(values["description"])
+            amounts.append(values["amount"])
+        bank_codes.extend([code] * len(file.transactions))
 
-        df = df.drop(columns="polarity")
-        dataframes.append(df)
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(dates, format="ISO8601"),
+            "description": pd.Series(descriptions, dtype="string[pyarrow]"),
+            "amount": pd.Series(amounts, dtype="float64"),
+            "bank": pd.Categorical.from_codes(bank_codes, categories=list(bank_names)),
+        }
+    )
 
-    concat_df = pd.concat(dataframes)
-    st.session_state["df"] = concat_df
-    return concat_df
 
+def report_memory_usage(df: pd.DataFrame, budget: int) -> int:
+    """Log the memory used by a transactions frame, warning when it's over `budget` bytes."""
+    usage = df.memory_usage(deep=True)
+    total = int(usage.sum())
+    logger.debug("Transactions use %d bytes: %s", total, usage.to_dict())
+    if total > budget:
+        logger.warning("Transactions use %d bytes, over the budget of %d bytes", total, budget)
+    return total
 
-def show_df(df: pd.DataFrame) -> None:
+
+def format_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Order and title-case columns for display and export."""
     desired_order = ["date", "description", "amount", "bank"]
     columns_to_use = [col for col in desired_order if col in df.columns]
     df = df[columns_to_use]
     df.columns = [col.title() for col in df.columns]
+    return df
+
+
+def show_diagnostics(processed_file: ProcessedFile) -> None:
+    for diagnostic in processed_file.diagnostics:
+        if diagnostic.level == DiagnosticLevel.ERROR:
+            st.error(diagnostic.message, icon="❗")
+        elif diagnostic.level == DiagnosticLevel.WARNING:
+            st.warning(diagnostic.message, icon="⚠️")
+        else:
+            st.info(diagnostic.message)
+
+
+# the frame is rendered as it is, without a formatted copy, so columns are ordered and labelled here
+DF_COLUMNS = ["date", "description", "amount", "bank"]
+DF_COLUMN_CONFIG = {
+    "date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+    "description": st.column_config.TextColumn("Description"),
+    "amount": st.column_config.NumberColumn("Amount", format="accounting"),
+    "bank": st.column_config.TextColumn("Bank"),
+}
+
+
+@dataclass
+class DfView:
+    """
+    What `show_df` derives from a transactions frame, kept in the session across reruns.
+
+    The frame itself is already in the session, so only its fingerprint,
+    total and exports are kept.
+    """
+
+    fingerprint: str
+    total: float
+    exports: dict[str, bytes] = field(default_factory=dict)
+
+    def get_export(self, df: pd.DataFrame, output_format: str) -> bytes:
+        """Export the frame, building each format only once it's asked for."""
+        if output_format not in self.exports:
+            self.exports[output_format] = EXPORT_FORMATS[output_format].export(format_df(df))
+        return self.exports[output_format]
+
+
+def get_df_fingerprint(df: pd.DataFrame) -> str:
+    """Hash the contents of a frame, which is far cheaper than rendering it again."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(repr(list(df.columns)).encode())
+    return digest.hexdigest()
+
+
+def get_df_view(df: pd.DataFrame) -> DfView:
+    """Total a frame for display, unless its transactions were already totalled."""
+    fingerprint = get_df_fingerprint(df)
+    view: DfView | None = st.session_state.get("df_view")
+    if view is None or view.fingerprint != fingerprint:
+        view = DfView(fingerprint, df["amount"].sum())
+        st.session_state["df_view"] = view
+    return view
+
+
+def show_df(df: pd.DataFrame) -> None:
+    view = get_df_view(df)
+    # formatting is left to the frontend, since a pandas Styler
+    # is recomputed cell by cell on every rerun
     st.dataframe(
-        df.style.format({"Amount": "{:,.2f}"}),
+        df,
         use_container_width=True,
         hide_index=True,
+        column_order=DF_COLUMNS,
+        column_config=DF_COLUMN_CONFIG,
+    )
+    st.write(f"Total Balance: ${view.total:,.2f}")
+
+    output_format = st.radio(
+        "Export format",
+        options=list(EXPORT_FORMATS),
+        format_func=lambda output_format: EXPORT_FORMATS[output_format].label,
+        horizontal=True,
+        key="export_format",
     )
-    total_balance = df["Amount"].sum()
-    st.write(f"Total Balance: ${total_balance:,.2f}")
-    csv = df.to_csv(index=False).encode("utf-8")
+    export_format = EXPORT_FORMATS[output_format]
     st.download_button(
-        label="Download CSV",
-        data=csv,
-        mime="text/csv",
+        label=f"Download {export_format.label}",
+        data=view.get_export(df, output_format),
+        file_name=f"transactions{export_format.extension}",
+        mime=export_format.mime,
+        # downloading doesn't change anything, so there's no need to rerun the app
+        on_click="ignore",
     )
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from enum import Enum
 
 from monopoly.statements import Transaction
 
@@ -8,10 +9,33 @@ class TransactionMetadata:
     bank_name: str
 
 
+class DiagnosticKind(str, Enum):
+    SAFETY_CHECK_FAILED = "safety_check_failed"
+    NO_SAFETY_CHECK = "no_safety_check"
+    GENERIC_BANK = "generic_bank"
+    OCR_APPLIED = "ocr_applied"
+
+
+class DiagnosticLevel(str, Enum):
+    INFO = "info"
+    WARNING = "warning"
+    ERROR = "error"
+
+
+@dataclass
+class Diagnostic:
+    """Something the user should know about a parsed statement, rendered by the caller."""
+
+    kind: DiagnosticKind
+    level: DiagnosticLevel
+    message: str
+
+
 @dataclass
 class ProcessedFile:
     transactions: list[Transaction]
     metadata: TransactionMetadata
+    diagnostics: list[Diagnostic] = field(default_factory=list)
 
     def __iter__(self):
         return iter(self.transactions)
@@ -0,0 +1,182 @@
+"""Adds an OCR text layer to scanned statements, reusing pages that were OCR'd before."""
+
+import hashlib
+import logging
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+from pathlib import Path
+
+import pymupdf
+from monopoly.pdf import PdfDocument
+
+from webapp.cache import get_ocr_cache
+
+logger = logging.getLogger(__name__)
+
+TESSERACT_CONFIG = Path(__file__).parent / "tesseract.cfg"
+
+# pages with less text than this have no usable text layer, which is
+# the same threshold monopoly uses to decide that a document needs OCR
+MIN_TEXT_LENGTH = 10
+
+
+@lru_cache(maxsize=1)
+def get_ocr_identity() -> bytes:
+    """OCR settings that affect the text layer, so that changing them invalidates cached pages."""
+    try:
+        ocrmypdf_version = version("ocrmypdf")
+    except PackageNotFoundError:
+        ocrmypdf_version = None
+    tesseract_config = TESSERACT_CONFIG.read_bytes() if TESSERACT_CONFIG.exists() else b""
+    return f"ocrmypdf=={ocrmypdf_version};".encode() + tesseract_config
+
+
+def has_text(page: pymupdf.Page) -> bool:
+    return len(page.get_text().strip()) >= MIN_TEXT_LENGTH
+
+
+def needs_ocr(page: pymupdf.Page) -> bool:
+    """Only scanned pages need OCR: pages with images and no text layer of their own."""
+    if has_text(page):
+        return False
+    # unlike get_images, this includes inline images drawn by the content stream itself
+    return bool(page.get_image_info())
+
+
+def get_scanned_pages(document: pymupdf.Document) -> list[int]:
+    """
+    Pick the pages to OCR, in a document that has no usable text layer.
+
+    If no page looks scanned, e.g. when its scan is drawn in a way that
+    isn't recognised as an image, every page without text is OCR'd instead.
+    """
+    scanned_pages = [page.number for page in document if needs_ocr(page)]
+    if not scanned_pages:
+        scanned_pages = [page.number for page in document if not has_text(page)]
+    return scanned_pages
+
+
+def get_page_key(document: pymupdf.Document, page_number: int) -> str:
+    """
+    Hash what a scanned page looks like to Tesseract.
+
+    The raw content and image streams are hashed without decoding them,
+    along with the page's cropbox and rotation, since both change the
+    image that is OCR'd.
+    """
+    page = document[page_number]
+    digest = hashlib.sha256()
+    for xref in page.get_contents():
+        digest.update(document.xref_stream_raw(xref) or b"")
+    for image in page.get_images(full=True):
+        digest.update(document.xref_stream_raw(image[0]) or b"")
+    digest.update(repr((tuple(page.cropbox), page.rotation)).encode())
+    digest.update(get_ocr_identity())
+    return digest.hexdigest()
+
+
+def ocr_document(document: PdfDocument, cropbox: tuple | None = None) -> PdfDocument:
+    """
+    Return a copy of `document` with an OCR text layer, cropping pages to `cropbox` first.
+
+    Only scanned pages are OCR'd, and the rest are kept as they are. Scanned
+    pages found in the OCR cache are copied from it, and the remaining ones
+    are OCR'd together in a single ocrmypdf run.
+    """
+    # certain PDFs have strange formats that can break the OCR,
+    # so they need to be cropped before further processing
+    if cropbox:
+        for page in document:
+            page.set_cropbox(cropbox)
+
+    ocr_pages = get_ocr_pages(document, get_scanned_pages(document))
+    if not ocr_pages:
+        return document
+
+    merged = pymupdf.open()
+    for page_number in range(document.page_count):
+        if page_number in ocr_pages:
+            with pymupdf.open(stream=ocr_pages[page_number], filetype="pdf") as page_pdf:
+                merged.insert_pdf(page_pdf)
+        else:
+            merged.insert_pdf(document, from_page=page_number, to_page=page_number)
+
+    ocr_pdf = PdfDocument(file_bytes=merged.tobytes())
+    ocr_pdf.metadata = document.metadata
+    ocr_pdf._name = document.name
+    return ocr_pdf
+
+
+def get_ocr_pages(document: PdfDocument, scanned_pages: list[int]) -> dict[int, bytes]:
+    """OCR scanned pages as single-page PDFs, copying the ones OCR'd before from the OCR cache."""
+    page_keys = {page_number: get_page_key(document, page_number) for page_number in scanned_pages}
+
+    cache = get_ocr_cache()
+    ocr_pages: dict[int, bytes] = {}
+    if cache:
+        for page_number, key in page_keys.items():
+            if (data := cache.read(key)) is not None:
+                ocr_pages[page_number] = data
+
+    missing_pages = [page_number for page_number in scanned_pages if page_number not in ocr_pages]
+    if missing_pages:
+        logger.debug("Applying OCR to %d of %d pages of %s", len(missing_pages), document.page_count, document.name)
+        for page_number, data in ocr_pdf_pages(document, missing_pages).items():
+            ocr_pages[page_number] = data
+            if cache:
+                cache.write(page_keys[page_number], data)
+    return ocr_pages
+
+
+def ocr_pdf_pages(document: pymupdf.Document, page_numbers: list[int]) -> dict[int, bytes]:
+    """OCR the given pages, and return each one as a single-page PDF by page number, or nothing if OCR was skipped."""
+    subset = pymupdf.open()
+    for page_number in page_numbers:
+        subset.insert_pdf(document, from_page=page_number, to_page=page_number)
+
+    ocr_bytes = run_ocrmypdf(subset.tobytes())
+    if ocr_bytes is None:
+        return {}
+
+    pages = {}
+    with pymupdf.open(stream=ocr_bytes, filetype="pdf") as ocr_pdf:
+        # pages are matched up by position, so a page that went missing would shift the rest
+        if ocr_pdf.page_count != len(page_numbers):
+            msg = f"OCR returned {ocr_pdf.page_count} pages, expected {len(page_numbers)}"
+            raise ValueError(msg)
+        for ocr_page_number, page_number in enumerate(page_numbers):
+            page_pdf = pymupdf.open()
+            page_pdf.insert_pdf(ocr_pdf, from_page=ocr_page_number, to_page=ocr_page_number)
+            pages[page_number] = page_pdf.tobytes(garbage=3, deflate=True)
+    return pages
+
+
+def run_ocrmypdf(pdf_bytes: bytes) -> bytes | None:
+    """Run ocrmypdf with the same settings as `PdfParser.apply_ocr`."""
+    # pylint: disable=import-outside-toplevel
+    try:
+        from ocrmypdf import Verbosity, configure_logging, ocr
+        from ocrmypdf.exceptions import PriorOcrFoundError, TaggedPDFError
+    except ImportError:
+        logger.warning("ocrmypdf not installed, skipping OCR")
+        return None
+
+    output_bytes = BytesIO()
+    configure_logging(Verbosity.quiet)
+    logging.getLogger("ocrmypdf").setLevel(logging.ERROR)
+    try:
+        ocr(
+            BytesIO(pdf_bytes),
+            output_bytes,
+            language="eng",
+            tesseract_config=str(TESSERACT_CONFIG),
+            progress_bar=False,
+            optimize=0,
+            fast_web_view=999999,
+            output_type="pdf",
+        )
+    except (PriorOcrFoundError, TaggedPDFError) as err:
+        logger.debug("OCR skipped: %s", err)
+        return None
+    return output_bytes.getvalue()
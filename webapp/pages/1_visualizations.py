@@ -4,9 +4,14 @@ import pandas as pd
 import plotly.graph_objs as go
 import streamlit as st
 
+from webapp.aggregates import GRANULARITIES, get_cash_flow_cube
+
 if TYPE_CHECKING:
     from streamlit.delta_generator import DeltaGenerator
 
+# plotly picks its own ticks for days and weeks
+X_AXIS_TICKS = {"Month": "M1", "Year": "M12"}
+
 
 def render_metric(column: "DeltaGenerator", title, value, title_color="#262730", value_color="#262730"):
     column.markdown(
@@ -20,7 +25,7 @@ def render_metric(column: "DeltaGenerator", title, value, title_color="#262730",
     )
 
 
-def show_stacked_bar_chart(df: pd.DataFrame):
+def show_stacked_bar_chart(df: pd.DataFrame, granularity: str = "Month"):
     income_trace = go.Bar(
         x=df.index,
         y=df["Income"],
@@ -43,18 +48,18 @@ def show_stacked_bar_chart(df: pd.DataFrame):
 
     savings_trace = go.Scatter(
         x=df.index,
-        y=df["Income"] - df["Expenses"],
+        y=df["Savings"],
         name="Savings",
         mode="lines",
         line={"color": "black", "width": 4},
         hoverinfo="text+name",
-        text=[f"${s:,.2f}" for s in df["amount"]],
+        text=[f"${s:,.2f}" for s in df["Savings"]],
     )
 
     layout = go.Layout(
         title="Cash Flow",
         title_font={"size": 26},
-        xaxis={"title": "Month", "showgrid": False, "dtick": "M1"},
+        xaxis={"title": granularity, "showgrid": False, "dtick": X_AXIS_TICKS.get(granularity)},
         yaxis={
             "title": "Amount",
             "showgrid": False,
@@ -74,7 +79,7 @@ def show_stacked_bar_chart(df: pd.DataFrame):
 
     total_income = round(df["Income"].sum())
     total_expenses = round(df["Expenses"].sum())
-    total_savings = round(df["amount"].sum())
+    total_savings = round(df["Savings"].sum())
 
     # Avoid division by zero
     savings_rate = total_savings / total_income * 100 if total_income > 0 else 0
@@ -94,15 +99,16 @@ def show_stacked_bar_chart(df: pd.DataFrame):
 st.markdown("# Visualizations")
 
 if "df" in st.session_state:
-    df: pd.DataFrame = st.session_state["df"].copy()
-    df.index = pd.to_datetime(df["date"])
-    df["Bank"] = df["bank"]
-    df["Income"] = df["amount"].apply(lambda x: max(0, x))
-    df["Expenses"] = df["amount"].apply(lambda x: abs(x) if x < 0 else 0)
-    df = df.drop(columns=["description", "date"])
-    df = df.resample("MS").sum()
-
-    show_stacked_bar_chart(df)
+    cube = get_cash_flow_cube(st.session_state["df"])
+    granularity_column, banks_column = st.columns([1, 2])
+    granularity = granularity_column.radio("Granularity", list(GRANULARITIES), index=2, horizontal=True)
+    banks = banks_column.multiselect("Banks", cube.banks, default=cube.banks)
+
+    cash_flow = cube.get(granularity, banks)
+    if cash_flow.empty:
+        st.info("No transactions for the selected banks.")
+    else:
+        show_stacked_bar_chart(cash_flow, granularity)
 
 if "df" not in st.session_state:
     switch_page_button = st.button("Convert a bank statement")
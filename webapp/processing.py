@@ -0,0 +1,112 @@
+import logging
+import multiprocessing
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from monopoly.pdf import PdfDocument
+from pydantic import SecretStr
+
+from webapp.helpers import parse_bank_statement
+from webapp.models import ProcessedFile
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_executor(max_workers: int) -> ProcessPoolExecutor | None:
+    """
+    Return a process pool shared across script reruns and sessions.
+
+    Returns None when only a single worker is configured, in which case
+    files should be parsed on the calling thread.
+    """
+    if max_workers <= 1:
+        return None
+    return create_executor(max_workers)
+
+
+@lru_cache(maxsize=1)
+def get_ocr_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Return a process pool dedicated to statements that need OCR.
+
+    OCR takes seconds per page, so it is kept apart from the parse pool
+    (and the script thread) to stop scanned statements from holding up
+    statements that already have a text layer.
+    """
+    return create_executor(max(max_workers, 1))
+
+
+def discard_executor(
+    get_pool: Callable[[int], ProcessPoolExecutor | None], max_workers: int, executor: ProcessPoolExecutor
+) -> None:
+    """
+    Drop a broken pool, so that the next call to `get_pool` starts a new one.
+
+    A pool breaks for good once any of its workers dies, e.g. on a segfault
+    or an OOM kill, and every submit to it raises BrokenProcessPool.
+    """
+    logger.warning("A worker process died, replacing the process pool")
+    # another session may have replaced the pool already
+    if get_pool(max_workers) is executor:
+        get_pool.cache_clear()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_executor(max_workers: int) -> ProcessPoolExecutor:
+    # forking a process that is running Streamlit's (or the API's) threads
+    # is unsafe, so workers are always started from a fresh interpreter
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+class ReplaceableExecutor(Executor):
+    """
+    Process pool that starts over with new workers once it breaks.
+
+    Used by long-running servers that own their pool, rather than sharing
+    one through `get_executor`.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.executor = create_executor(max_workers)
+        self.lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self.replace(executor)
+            return self.executor.submit(fn, *args, **kwargs)
+
+    def replace(self, broken: ProcessPoolExecutor) -> None:
+        with self.lock:
+            # a concurrent submit may have replaced the pool already
+            if self.executor is broken:
+                logger.warning("A worker process died, replacing the process pool")
+                self.executor = create_executor(self.max_workers)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:  # noqa: FBT001, FBT002
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def parse_file(
+    file_bytes: bytes, file_name: str, passwords: list[SecretStr] | None = None, *, apply_ocr: bool = True
+) -> ProcessedFile:
+    """
+    Load, unlock and parse a single statement.
+
+    This is the unit of work submitted to the process pool, so it only
+    accepts and returns picklable values.
+    """
+    document = PdfDocument(file_bytes=file_bytes, passwords=passwords)
+    document._name = file_name
+    if document.is_encrypted:  # pylint: disable=no-member
+        document = document.unlock_document()
+    return parse_bank_statement(document, apply_ocr=apply_ocr)